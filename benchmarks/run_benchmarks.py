@@ -0,0 +1,358 @@
+"""
+Benchmarks for the script runner and page generator, on synthetic
+script directories of various sizes.
+
+Run the benchmarks, saving the results, with:
+
+.. code::
+
+   python run_benchmarks.py --sizes 100 1000 10000 --output results.json
+
+and compare two sets of results (e.g. from two commits) with:
+
+.. code::
+
+   python run_benchmarks.py --compare old_results.json new_results.json
+"""
+
+import argparse as ap
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter, strftime
+
+# Benchmark the checkout that contains this file, rather than any
+# installed copy, so that the results match the commit that is recorded.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from synthetic import generate_outputs, generate_scripts  # noqa: E402
+
+from scrunner import ScriptRunner, WebpageCreator, __version__  # noqa: E402
+
+
+def time_function(function, repeats: int) -> dict[str, float]:
+    """
+    Times repeated calls of a function, returning the ``min``,
+    ``median``, and ``max`` time taken in seconds.
+    """
+
+    times = []
+
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+
+    return dict(
+        min=min(times),
+        median=statistics.median(times),
+        max=max(times),
+        repeats=repeats,
+    )
+
+
+def get_launch_baseline(repeats: int) -> float:
+    """
+    Gets the median time taken to launch an empty python process,
+    which is the lower limit of the time taken to run a script.
+    """
+
+    return time_function(
+        lambda: subprocess.run([sys.executable, "-c", "pass"], check=True),
+        repeats=repeats,
+    )["median"]
+
+
+def benchmark_size(
+    directory: Path,
+    n_scripts: int,
+    body: str,
+    number_of_figures: int,
+    launch_sample: int,
+    sleep_time: float,
+    repeats: int,
+    launch_baseline: float,
+) -> list[dict]:
+    """
+    Runs all of the benchmarks for a synthetic script directory of a
+    given size.
+
+    Parameters
+    ----------
+
+    directory: Path
+        Temporary directory to generate the scripts and outputs in.
+
+    n_scripts: int
+        The number of scripts to generate.
+
+    body: str
+        The body of the scripts (see ``synthetic.BODIES``).
+
+    number_of_figures: int
+        The number of figures for multi-output outputs.
+
+    launch_sample: int
+        The number of scripts to run, to measure the launch overhead.
+
+    sleep_time: float
+        The time (in seconds) that ``sleep`` scripts sleep for.
+
+    repeats: int
+        The number of times to repeat each measurement.
+
+    launch_baseline: float
+        The time taken to launch an empty python process.
+
+    Returns
+    -------
+
+    results: list[dict]
+        The results of each benchmark.
+    """
+
+    script_directory = directory / "scripts"
+    output_directory = directory / "output"
+
+    generate_scripts(
+        directory=script_directory,
+        n_scripts=n_scripts,
+        body=body,
+        sleep_time=sleep_time,
+    )
+
+    runner = ScriptRunner(path=script_directory)
+    parameters = dict(
+        n_scripts=n_scripts, body=body, number_of_figures=number_of_figures
+    )
+    results = []
+
+    def add_result(benchmark: str, timing: dict, **extra):
+        results.append(dict(benchmark=benchmark, **parameters, **timing, **extra))
+        print(f"{benchmark:>16} {n_scripts:>8} {body:>8} {timing['median']:>12.6f} s")
+
+    add_result("parse_scripts", time_function(runner.parse_scripts, repeats))
+
+    add_result(
+        "get_metadata",
+        time_function(
+            lambda: runner.get_metadata(
+                file_type="png", number_of_figures=number_of_figures
+            ),
+            repeats,
+        ),
+    )
+
+    metadata = runner.get_metadata(file_type="png", number_of_figures=number_of_figures)
+    generate_outputs(output_directory=output_directory, metadata=metadata)
+
+    webpage = WebpageCreator()
+    webpage.add_metadata(page_name="Benchmark")
+
+    add_result(
+        "add_plots",
+        time_function(
+            lambda: webpage.add_plots(data=metadata, output_directory=output_directory),
+            repeats,
+        ),
+        n_outputs=sum(len(x["filenames"]) for x in metadata),
+    )
+
+    add_result("render_webpage", time_function(webpage.render_webpage, repeats))
+
+    sample = runner.select(scripts=runner.script_paths[:launch_sample])
+
+    def run_sample():
+        with contextlib.redirect_stdout(io.StringIO()):
+            runner.run(
+                data=[],
+                output_directory=output_directory,
+                file_type="png",
+                number_of_figures=number_of_figures,
+                stylesheet="default",
+                scripts=sample,
+            )
+
+    timing = time_function(run_sample, repeats=repeats)
+    per_script = timing["median"] / max(len(sample), 1)
+
+    add_result(
+        "run",
+        timing,
+        n_run=len(sample),
+        per_script=per_script,
+        launch_baseline=launch_baseline,
+        launch_overhead=(
+            per_script - launch_baseline - (sleep_time if body == "sleep" else 0.0)
+            if body in ("trivial", "sleep")
+            else None
+        ),
+    )
+
+    return results
+
+
+def get_environment() -> dict:
+    """
+    Gets information about the environment that the benchmarks were
+    ran in, including the git commit if available.
+    """
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            encoding="utf-8",
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return dict(
+        scrunner_version=__version__,
+        commit=commit,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        date=strftime(r"%Y-%m-%dT%H:%M:%S"),
+    )
+
+
+def compare(old_filename: Path, new_filename: Path):
+    """
+    Prints a comparison of two sets of benchmark results.
+    """
+
+    def load(filename: Path) -> dict:
+        with open(filename, "r") as handle:
+            results = json.load(handle)
+
+        return {
+            (x["benchmark"], x["n_scripts"], x["body"], x["number_of_figures"]): x
+            for x in results["results"]
+        }
+
+    old = load(old_filename)
+    new = load(new_filename)
+
+    print(
+        f"{'benchmark':>16} {'n_scripts':>10} {'body':>8} "
+        f"{'old / s':>12} {'new / s':>12} {'new / old':>10}"
+    )
+
+    for key in sorted(old.keys() & new.keys()):
+        old_time = old[key]["median"]
+        new_time = new[key]["median"]
+
+        print(
+            f"{key[0]:>16} {key[1]:>10} {key[2]:>8} "
+            f"{old_time:>12.6f} {new_time:>12.6f} {new_time / old_time:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = ap.ArgumentParser(
+        description=(
+            "Benchmarks scrunner on synthetic script directories, writing "
+            + "machine-readable results that can be compared across commits."
+        )
+    )
+
+    parser.add_argument(
+        "--sizes",
+        help="Numbers of scripts to benchmark with.",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+    )
+
+    parser.add_argument(
+        "--bodies",
+        help="Script bodies to benchmark with.",
+        type=str,
+        nargs="+",
+        choices=["trivial", "sleep", "cpu"],
+        default=["trivial"],
+    )
+
+    parser.add_argument(
+        "-n",
+        "--number-of-figures",
+        help="Number of figures for multi-output outputs.",
+        type=int,
+        default=10,
+    )
+
+    parser.add_argument(
+        "--launch-sample",
+        help="Number of scripts to run to measure the launch overhead.",
+        type=int,
+        default=50,
+    )
+
+    parser.add_argument(
+        "--sleep-time",
+        help="Time (in seconds) that sleep scripts sleep for.",
+        type=float,
+        default=0.01,
+    )
+
+    parser.add_argument(
+        "--repeats",
+        help="Number of times to repeat each measurement.",
+        type=int,
+        default=5,
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="File to save the results to, as JSON.",
+        type=Path,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--compare",
+        help="Compare two results files, rather than running benchmarks.",
+        type=Path,
+        nargs=2,
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare(*args.compare)
+        sys.exit(0)
+
+    launch_baseline = get_launch_baseline(repeats=args.repeats)
+    print(f"Empty python process launch time: {launch_baseline:.6f} s")
+
+    results = []
+
+    for n_scripts in args.sizes:
+        for body in args.bodies:
+            with tempfile.TemporaryDirectory() as directory:
+                results += benchmark_size(
+                    directory=Path(directory),
+                    n_scripts=n_scripts,
+                    body=body,
+                    number_of_figures=args.number_of_figures,
+                    launch_sample=args.launch_sample,
+                    sleep_time=args.sleep_time,
+                    repeats=args.repeats,
+                    launch_baseline=launch_baseline,
+                )
+
+    if args.output is not None:
+        with open(args.output, "w") as handle:
+            json.dump(
+                dict(environment=get_environment(), results=results), handle, indent=2
+            )
@@ -0,0 +1,141 @@
+"""
+Generates synthetic script directories, and fake output trees, for
+benchmarking.
+"""
+
+import json
+import random
+from pathlib import Path
+
+# Bodies of the generated scripts. The trivial body does not import
+# scrunner, so that running it measures only the launch overhead.
+BODIES = {
+    "trivial": "",
+    "sleep": "import time\n\ntime.sleep({sleep_time})\n",
+    "cpu": "total = 0\nfor i in range({cpu_iterations}):\n    total += i * i\n",
+}
+
+
+def generate_frontmatter(index: int, rng: random.Random) -> dict:
+    """
+    Generates (varied) frontmatter for the synthetic script ``index``.
+    """
+
+    frontmatter = dict(name=f"script_{index}.py")
+
+    if rng.random() < 0.8:
+        frontmatter["created_by"] = "Benchmark"
+        frontmatter["contact_email"] = "benchmark@example.com"
+
+    if rng.random() < 0.02:
+        frontmatter["capture_stdout"] = "True"
+
+    if rng.random() < 0.5:
+        frontmatter["tags"] = rng.sample(["stellar", "gas", "halo", "slow"], k=2)
+
+    if index > 0 and rng.random() < 0.1:
+        frontmatter["requires"] = [f"script_{rng.randrange(index)}.py"]
+
+    frontmatter["outputs"] = [
+        dict(
+            filename=f"script_{index}_output_{n}",
+            title=f"Script {index} Output {n}",
+            description=f"Output {n} of synthetic script {index}, with $x^2$.",
+            multi_output=str(rng.random() < 0.3),
+        )
+        for n in range(rng.randint(0, 3))
+    ]
+
+    return frontmatter
+
+
+def generate_scripts(
+    directory: Path,
+    n_scripts: int,
+    body: str = "trivial",
+    sleep_time: float = 0.01,
+    cpu_iterations: int = 100000,
+    seed: int = 0,
+):
+    """
+    Generates a directory of synthetic scripts, with valid frontmatter.
+
+    Parameters
+    ----------
+
+    directory: Path
+        The directory to create the scripts in.
+
+    n_scripts: int
+        The number of scripts to generate.
+
+    body: str
+        The body of the scripts, one of ``trivial``, ``sleep``, or
+        ``cpu``.
+
+    sleep_time: float
+        The time (in seconds) that ``sleep`` scripts sleep for.
+
+    cpu_iterations: int
+        The number of loop iterations in ``cpu`` scripts.
+
+    seed: int
+        Seed for the random choice of frontmatter.
+    """
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    rng = random.Random(seed)
+    code = BODIES[body].format(sleep_time=sleep_time, cpu_iterations=cpu_iterations)
+
+    for index in range(n_scripts):
+        frontmatter = json.dumps(generate_frontmatter(index, rng), indent=4)
+
+        with open(directory / f"script_{index}.py", "w") as handle:
+            handle.write(
+                f'"""\nSynthetic script {index}.\n\n---\n{frontmatter}\n---\n"""\n\n'
+                + code
+            )
+
+    return
+
+
+def generate_outputs(
+    output_directory: Path,
+    metadata: list[dict],
+    fraction: float = 0.9,
+    seed: int = 0,
+):
+    """
+    Generates a fake output tree, containing (small, empty) files for a
+    random fraction of the outputs described by ``metadata``.
+
+    Parameters
+    ----------
+
+    output_directory: Path
+        The directory to create the outputs in.
+
+    metadata: list[dict]
+        Result of ``ScriptRunner.get_metadata()``.
+
+    fraction: float
+        The fraction of outputs to create; the remainder are treated
+        as failed.
+
+    seed: int
+        Seed for the random choice of outputs.
+    """
+
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    rng = random.Random(seed)
+
+    for plot in metadata:
+        for filename in plot["filenames"]:
+            if rng.random() < fraction:
+                (output_directory / filename).touch()
+
+    return
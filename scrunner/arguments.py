@@ -4,8 +4,15 @@ they conform to the correct API.
 """
 
 import argparse as ap
+import atexit
+import os
+import sys
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from threading import BoundedSemaphore
+from typing import Any, Optional
+from uuid import uuid4
 
 import attr
 
@@ -20,8 +27,16 @@ class ScriptArgumentParser:
     + ``-f``: File type that the figures should be output with.
     + ``-n``: Number of figures to create.
     + ``-s``: Matplotlib stylesheet to use.
+
+    Figures may be written in the background with ``save_figure``;
+    ``max_figure_writers`` sets the number of writer threads, and
+    ``max_figures_in_flight`` caps how many figures may be queued
+    (and hence held in memory) at once.
     """
 
+    max_figure_writers = attr.ib(type=int, default=1)
+    max_figures_in_flight = attr.ib(type=int, default=4)
+
     parser: ap.ArgumentParser
 
     data: list[Path]
@@ -30,6 +45,10 @@ class ScriptArgumentParser:
     number_of_figures: int
     stylesheet: str
 
+    figure_pool: Optional[ThreadPoolExecutor]
+    figure_slots: BoundedSemaphore
+    figure_futures: list[Future]
+
     def __attrs_post_init__(self):
         """
         Initialises the argument parser object and parses the args, as they say.
@@ -38,6 +57,10 @@ class ScriptArgumentParser:
         self.setup_parser()
         self.parse_arguments()
 
+        self.figure_pool = None
+        self.figure_slots = BoundedSemaphore(max(1, self.max_figures_in_flight))
+        self.figure_futures = []
+
         return
 
     def setup_parser(self):
@@ -136,3 +159,165 @@ class ScriptArgumentParser:
             )
         else:
             return self.output_directory / f"{base_name}.{self.file_type}"
+
+    def save_figure(
+        self,
+        fig: Any,
+        base_name: str,
+        output_number: Optional[int] = None,
+        close: bool = True,
+        **kwargs,
+    ) -> Path:
+        """
+        Saves a matplotlib figure in the background, so that the
+        script can continue computing the next figure while this
+        one is being rendered and written to disk.
+
+        Parameters
+        ----------
+
+        fig: matplotlib.figure.Figure
+            The figure to save. It must not be modified after it has
+            been handed to this method.
+
+        base_name: str
+            The base name of the file, passed to
+            ``get_filename_for_output``.
+
+        output_number: Optional[int]
+            The output number that this file corresponds to, passed to
+            ``get_filename_for_output``.
+
+        close: bool
+            Whether to close the figure in ``pyplot`` before it is
+            written, so that ``pyplot`` does not keep a reference to
+            it. Defaults to ``True``.
+
+        **kwargs
+            Additional keyword arguments passed to ``fig.savefig``.
+
+        Returns
+        -------
+
+        Path
+            The ``pathlib`` object at which the figure will be
+            saved.
+
+        Notes
+        -----
+
+        This call blocks if ``max_figures_in_flight`` figures are
+        already waiting to be written. Any errors raised while writing
+        a previous figure are re-raised here, and all pending figures
+        are flushed at interpreter exit, with the script exiting with
+        a non-zero return code if any of them failed.
+        """
+
+        filename = self.get_filename_for_output(
+            base_name=base_name, output_number=output_number
+        )
+
+        self.raise_figure_errors()
+
+        if close:
+            import matplotlib.pyplot as plt
+
+            plt.close(fig)
+
+        if self.figure_pool is None:
+            self.figure_pool = ThreadPoolExecutor(
+                max_workers=max(1, self.max_figure_writers),
+                thread_name_prefix="scrunner-figure",
+            )
+            atexit.register(self._flush_figures_at_exit)
+
+        self.figure_slots.acquire()
+
+        try:
+            future = self.figure_pool.submit(
+                self._write_figure, fig, filename, **kwargs
+            )
+        except BaseException:
+            self.figure_slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self.figure_slots.release())
+        self.figure_futures.append(future)
+
+        return filename
+
+    def _write_figure(self, fig: Any, filename: Path, **kwargs):
+        """
+        Writes a figure to a temporary file, which then replaces
+        ``filename``. This makes sure that a partially written figure is
+        never visible, and that a file that ``filename`` is linked to
+        (e.g. by an object store) is never modified.
+        """
+
+        filename = Path(filename)
+        temporary = filename.with_name(
+            f".{filename.stem}.{uuid4().hex}{filename.suffix}"
+        )
+
+        try:
+            fig.savefig(temporary, **kwargs)
+            os.replace(temporary, filename)
+        finally:
+            temporary.unlink(missing_ok=True)
+
+        return
+
+    def raise_figure_errors(self):
+        """
+        Re-raises the first error from any figure that has finished
+        writing, and forgets about all completed writes.
+        """
+
+        pending = []
+        error = None
+
+        for future in self.figure_futures:
+            if not future.done():
+                pending.append(future)
+            elif error is None and future.exception() is not None:
+                error = future.exception()
+
+        self.figure_futures = pending
+
+        if error is not None:
+            raise error
+
+        return
+
+    def flush_figures(self):
+        """
+        Blocks until all figures passed to ``save_figure`` have been
+        written, re-raising the first error that occurred (if any).
+        """
+
+        for future in self.figure_futures:
+            future.exception()
+
+        self.raise_figure_errors()
+
+        return
+
+    def _flush_figures_at_exit(self):
+        """
+        Flushes pending figures as the interpreter exits. As exceptions
+        raised in ``atexit`` handlers do not change the return code, a
+        failed write terminates the process with a return code of 1.
+        """
+
+        try:
+            self.flush_figures()
+        except BaseException:
+            traceback.print_exc()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(1)
+        finally:
+            if self.figure_pool is not None:
+                self.figure_pool.shutdown(wait=True)
+
+        return
@@ -0,0 +1,205 @@
+"""
+Numeric comparison of the outputs of two runs of the same scripts.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Union
+
+from scrunner.runner import ScriptRunner
+from scrunner.store import hash_file
+
+# File types that can be compared pixel-by-pixel. Vector formats embed
+# metadata (such as creation dates) that make every output differ, and
+# cannot be decoded without rasterising them.
+RASTER_FILE_TYPES = ("png", "jpg", "jpeg", "tif", "tiff", "webp", "bmp", "gif")
+
+
+def load_image(path: Path):
+    """
+    Loads an image as a floating point array with values between zero
+    and one, and shape ``(height, width, channels)``.
+    """
+
+    import matplotlib.image
+    import numpy as np
+
+    image = np.asarray(matplotlib.image.imread(path))
+
+    if np.issubdtype(image.dtype, np.integer):
+        image = image / np.iinfo(image.dtype).max
+
+    if image.ndim == 2:
+        image = image[:, :, None]
+
+    return image.astype(np.float32)
+
+
+def compare_outputs(
+    reference: Path, comparison: Path, heatmap: Path
+) -> dict[str, Union[str, Optional[float]]]:
+    """
+    Compares a single output between two runs.
+
+    Identical files are detected from their hashes, without being
+    decoded, and outputs that are missing from both runs are treated as
+    identical, as are images that decode to the same pixels. Only
+    images with one of the ``RASTER_FILE_TYPES`` can be decoded. Otherwise, both are loaded as images and the per-pixel
+    difference is computed; the maximum absolute difference over the
+    channels of each pixel is saved as a heatmap.
+
+    Parameters
+    ----------
+
+    reference: Path
+        Path to the output in the reference run.
+
+    comparison: Path
+        Path to the output in the run being compared.
+
+    heatmap: Path
+        Path to save the difference heatmap to.
+
+    Returns
+    -------
+
+    result: dict[str, Union[str, Optional[float]]]
+        The ``status`` of the comparison (one of ``identical``,
+        ``changed``, ``missing`` from exactly one of the runs, or
+        ``undecodable``) and its ``magnitude``, the root mean square
+        difference between the images (or ``None`` if it could not be
+        calculated).
+    """
+
+    if not reference.exists() and not comparison.exists():
+        return dict(status="identical", magnitude=0.0)
+
+    if not reference.exists() or not comparison.exists():
+        return dict(status="missing", magnitude=None)
+
+    if os.path.samefile(reference, comparison) or (
+        reference.stat().st_size == comparison.stat().st_size
+        and hash_file(reference) == hash_file(comparison)
+    ):
+        return dict(status="identical", magnitude=0.0)
+
+    try:
+        reference_image = load_image(reference)
+        comparison_image = load_image(comparison)
+    except (OSError, ValueError, SyntaxError):
+        return dict(status="undecodable", magnitude=None)
+
+    if reference_image.shape[:2] != comparison_image.shape[:2]:
+        return dict(status="changed", magnitude=None)
+
+    import matplotlib.image
+    import numpy as np
+
+    # Compare only the colour channels present in both images.
+    n_channels = min(reference_image.shape[2], comparison_image.shape[2], 3)
+    difference = np.abs(
+        reference_image[:, :, :n_channels] - comparison_image[:, :, :n_channels]
+    )
+
+    magnitude = float(np.sqrt(np.mean(difference**2)))
+
+    if magnitude == 0.0:
+        return dict(status="identical", magnitude=0.0)
+
+    heatmap.parent.mkdir(parents=True, exist_ok=True)
+    matplotlib.image.imsave(
+        heatmap, difference.max(axis=2), cmap="inferno", vmin=0.0, vmax=1.0
+    )
+
+    return dict(status="changed", magnitude=magnitude)
+
+
+def diff_outputs(
+    runner: ScriptRunner,
+    reference_directory: Path,
+    comparison_directory: Path,
+    output_directory: Path,
+    file_type: str,
+    number_of_figures: int,
+    max_workers: Optional[int] = None,
+) -> list[dict[str, Union[str, Path, Optional[float]]]]:
+    """
+    Compares all of the outputs of the scripts between two output
+    directories, in parallel.
+
+    Parameters
+    ----------
+
+    runner: ScriptRunner
+        Runner for the scripts that produced both sets of outputs.
+
+    reference_directory: Path
+        The output directory of the reference run.
+
+    comparison_directory: Path
+        The output directory of the run to compare to the reference.
+
+    output_directory: Path
+        The directory to save difference heatmaps in (in
+        ``heatmaps/``).
+
+    file_type: str
+        The file extension of the outputs.
+
+    number_of_figures: int
+        The number of figures that each script produced.
+
+    max_workers: int, optional
+        The number of processes to use. Defaults to the number of CPUs.
+
+    Returns
+    -------
+
+    diffs: list[dict[str, Union[str, Path, Optional[float]]]]
+        The outputs that are not identical in both runs, sorted by
+        decreasing ``magnitude`` (outputs with no magnitude come last).
+        Each contains the ``title`` and ``description`` of the output,
+        its ``filename``, the ``status`` and ``magnitude`` of the
+        comparison, and the ``heatmap`` path, relative to the
+        ``output_directory``, for changed images.
+    """
+
+    comparisons = []
+
+    for plot in runner.get_metadata(
+        file_type=file_type, number_of_figures=number_of_figures
+    ):
+        for filename in plot["filenames"]:
+            comparisons.append(
+                dict(
+                    title=plot["title"],
+                    description=plot["description"],
+                    filename=filename,
+                    heatmap=Path("heatmaps") / filename.with_suffix(".png"),
+                )
+            )
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            compare_outputs,
+            [reference_directory / x["filename"] for x in comparisons],
+            [comparison_directory / x["filename"] for x in comparisons],
+            [output_directory / x["heatmap"] for x in comparisons],
+            chunksize=max(1, len(comparisons) // (4 * (os.cpu_count() or 1))),
+        )
+
+        diffs = [
+            {**comparison, **result}
+            for comparison, result in zip(comparisons, results)
+            if result["status"] != "identical"
+        ]
+
+    for diff in diffs:
+        if diff["magnitude"] is None:
+            diff["heatmap"] = None
+
+    return sorted(
+        diffs,
+        key=lambda x: (x["magnitude"] is None, -(x["magnitude"] or 0.0)),
+    )
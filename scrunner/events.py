@@ -0,0 +1,385 @@
+"""
+Live monitoring of runs, through a structured event stream and
+Prometheus text-file metrics.
+"""
+
+import json
+import os
+import socket
+from pathlib import Path
+from threading import Lock, Timer
+from time import perf_counter, time
+from typing import Optional, TextIO
+
+import attr
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+DEFAULT_DURATION_BUCKETS = (
+    0.1,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+    1800.0,
+    3600.0,
+)
+
+
+def get_child_resources() -> dict[str, float]:
+    """
+    Gets the resources used by all (waited-for) child processes so far.
+    Differences between two calls give the CPU time used by the
+    scripts that finished in between; ``max_rss`` (in kilobytes, on
+    Linux) is the largest resident set size of any child so far.
+    """
+
+    if resource is None:
+        return {}
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return dict(
+        user_time=usage.ru_utime,
+        system_time=usage.ru_stime,
+        max_rss=usage.ru_maxrss,
+    )
+
+
+@attr.s(auto_attribs=False)
+class EventStream:
+    """
+    Writes events as JSON lines, each containing the ``event`` type, the
+    unix ``time``, and any additional fields.
+
+    The ``target`` is either a file path (which is appended to), or
+    a socket address of the form ``tcp://host:port`` or
+    ``unix:///path/to/socket``. If a socket is closed by the other end,
+    a warning is printed and no further events are sent, rather than
+    interrupting the run.
+    """
+
+    target = attr.ib(type=str, converter=str)
+
+    handle: TextIO
+    connection: Optional[socket.socket]
+    lock: Lock
+    disabled: bool
+
+    def __attrs_post_init__(self):
+        """
+        Opens the file or socket.
+        """
+
+        self.connection = None
+        self.lock = Lock()
+        self.disabled = False
+
+        if self.target.startswith("tcp://"):
+            host, port = self.target[len("tcp://") :].rsplit(":", 1)
+            self.connection = socket.create_connection((host, int(port)))
+        elif self.target.startswith("unix://"):
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(self.target[len("unix://") :])
+
+        if self.connection is not None:
+            self.handle = self.connection.makefile("w", encoding="utf-8")
+        else:
+            self.handle = open(self.target, "a", encoding="utf-8")
+
+    def emit(self, event: str, **fields):
+        """
+        Writes a single event.
+
+        Parameters
+        ----------
+
+        event: str
+            The type of event, for example ``script_started``.
+
+        **fields
+            Additional information about the event. These must be
+            JSON serialisable (paths are converted to strings).
+        """
+
+        line = json.dumps(dict(event=event, time=time(), **fields), default=str)
+
+        with self.lock:
+            if self.disabled:
+                return
+
+            try:
+                self.handle.write(f"{line}\n")
+                self.handle.flush()
+            except OSError as error:
+                if self.connection is None:
+                    raise
+
+                self.disabled = True
+                print(
+                    f"Event stream {self.target} was lost ({error}); "
+                    "no further events will be sent"
+                )
+
+        return
+
+    def close(self):
+        """
+        Closes the file or socket.
+        """
+
+        if self.connection is None:
+            self.handle.close()
+            return
+
+        try:
+            self.handle.close()
+        except OSError:
+            # Unsent events are lost if the other end has gone away.
+            pass
+
+        self.connection.close()
+
+        return
+
+
+@attr.s(auto_attribs=False)
+class MetricsExporter:
+    """
+    Keeps track of metrics for a run, and writes them to ``path`` in the
+    Prometheus text format (suitable for, e.g., the node exporter
+    text-file collector).
+
+    The file is re-written atomically when the metrics change, but at
+    most once every ``write_interval`` seconds; changes made in between
+    are written (from a timer thread) once the interval has passed, and
+    always at the end of the run. The size of the file does not grow
+    with the number of scripts.
+    """
+
+    path = attr.ib(type=Path, converter=Path)
+    buckets = attr.ib(type=tuple[float, ...], default=DEFAULT_DURATION_BUCKETS)
+    write_interval = attr.ib(type=float, default=1.0)
+
+    start_time: float
+    queued: int
+    running: int
+    completed: dict[str, int]
+    retried: dict[str, int]
+    bucket_counts: dict[str, list[int]]
+    duration_sums: dict[str, float]
+    last_write: Optional[float]
+    pending_write: Optional[Timer]
+    lock: Lock
+
+    def __attrs_post_init__(self):
+        """
+        Initialises the (empty) metrics.
+        """
+
+        self.start_time = perf_counter()
+        self.queued = 0
+        self.running = 0
+        self.completed = dict(success=0, warning=0, failure=0)
+        self.retried = {}
+        self.bucket_counts = {
+            status: [0] * len(self.buckets) for status in self.completed
+        }
+        self.duration_sums = {status: 0.0 for status in self.completed}
+        self.last_write = None
+        self.pending_write = None
+        self.lock = Lock()
+
+    def run_started(self, n_scripts: int):
+        """
+        Records the start of a run of ``n_scripts`` scripts.
+        """
+
+        with self.lock:
+            self.queued += n_scripts
+
+        self.update()
+
+        return
+
+    def script_started(self):
+        """
+        Records that a script has been started.
+        """
+
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+        self.update()
+
+        return
+
+    def script_finished(self, duration: float, status: str):
+        """
+        Records that a script has finished.
+
+        Parameters
+        ----------
+
+        duration: float
+            The time taken by the script, in seconds.
+
+        status: str
+            One of ``success``, ``warning``, or ``failure``.
+        """
+
+        with self.lock:
+            self.running -= 1
+            self.completed[status] = self.completed.get(status, 0) + 1
+            self.duration_sums[status] = self.duration_sums.get(status, 0.0) + duration
+
+            counts = self.bucket_counts.setdefault(status, [0] * len(self.buckets))
+
+            # Buckets are cumulative, so the duration is counted in all of
+            # the buckets from the first one that it fits into.
+            for index, bucket in enumerate(self.buckets):
+                if duration <= bucket:
+                    counts[index] += 1
+
+        self.update()
+
+        return
+
+    def script_retried(self, failure_class: str):
+        """
+        Records that a script is being retried, after a failure of
+        ``failure_class`` (see ``scrunner.failures.classify_failure``).
+        """
+
+        with self.lock:
+            self.retried[failure_class] = self.retried.get(failure_class, 0) + 1
+
+        self.update()
+
+        return
+
+    def run_finished(self):
+        """
+        Records that the run has finished (or been cancelled), dropping
+        any scripts that are still queued, and writes the metrics.
+        """
+
+        with self.lock:
+            self.queued = 0
+            self.running = 0
+
+        self.write()
+
+        return
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the Prometheus text format.
+        """
+
+        n_completed = sum(self.completed.values())
+        throughput = n_completed / max(perf_counter() - self.start_time, 1e-9)
+
+        lines = [
+            "# HELP scrunner_queued_scripts Scripts waiting to run.",
+            "# TYPE scrunner_queued_scripts gauge",
+            f"scrunner_queued_scripts {self.queued}",
+            "# HELP scrunner_running_scripts Scripts currently running.",
+            "# TYPE scrunner_running_scripts gauge",
+            f"scrunner_running_scripts {self.running}",
+            "# HELP scrunner_scripts_total Scripts that have finished, by status.",
+            "# TYPE scrunner_scripts_total counter",
+            *[
+                f'scrunner_scripts_total{{status="{status}"}} {count}'
+                for status, count in self.completed.items()
+            ],
+            "# HELP scrunner_script_retries_total Scripts retried after a "
+            + "transient failure, by class of failure.",
+            "# TYPE scrunner_script_retries_total counter",
+            *[
+                f'scrunner_script_retries_total{{class="{failure_class}"}} {count}'
+                for failure_class, count in sorted(self.retried.items())
+            ],
+            "# HELP scrunner_throughput_scripts_per_second Scripts finished per "
+            + "second since the start of the run.",
+            "# TYPE scrunner_throughput_scripts_per_second gauge",
+            f"scrunner_throughput_scripts_per_second {throughput}",
+            "# HELP scrunner_script_duration_seconds Time taken by scripts, by "
+            + "status.",
+            "# TYPE scrunner_script_duration_seconds histogram",
+        ]
+
+        for status, counts in self.bucket_counts.items():
+            lines += [
+                f'scrunner_script_duration_seconds_bucket{{status="{status}",'
+                + f'le="{bucket}"}} {count}'
+                for bucket, count in zip(self.buckets, counts)
+            ]
+
+            lines += [
+                f'scrunner_script_duration_seconds_bucket{{status="{status}",'
+                + f'le="+Inf"}} {self.completed.get(status, 0)}',
+                f'scrunner_script_duration_seconds_sum{{status="{status}"}} '
+                + f"{self.duration_sums.get(status, 0.0)}",
+                f'scrunner_script_duration_seconds_count{{status="{status}"}} '
+                + f"{self.completed.get(status, 0)}",
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def update(self):
+        """
+        Writes the metrics if they have not been written in the last
+        ``write_interval`` seconds, and otherwise schedules them to be
+        written once it has passed.
+        """
+
+        with self.lock:
+            if self.pending_write is not None:
+                return
+
+            if self.last_write is not None:
+                wait = self.last_write + self.write_interval - perf_counter()
+
+                if wait > 0.0:
+                    self.pending_write = Timer(wait, self.write)
+                    self.pending_write.daemon = True
+                    self.pending_write.start()
+
+                    return
+
+        self.write()
+
+        return
+
+    def write(self):
+        """
+        Atomically (re-)writes the metrics file.
+        """
+
+        with self.lock:
+            if self.pending_write is not None:
+                self.pending_write.cancel()
+                self.pending_write = None
+
+            temporary = self.path.with_name(f".{self.path.name}.tmp")
+
+            with open(temporary, "w") as handle:
+                handle.write(self.render())
+
+            os.replace(temporary, self.path)
+
+            self.last_write = perf_counter()
+
+        return
@@ -0,0 +1,219 @@
+"""
+Classification of script failures, and the policy for retrying those
+that are likely to be transient (e.g. filesystem hiccups, or being
+killed for running out of memory on a busy node).
+"""
+
+import re
+import signal
+from contextlib import nullcontext
+from pathlib import Path
+from threading import Event, Lock
+from time import perf_counter, sleep
+from typing import ContextManager, Optional
+
+import attr
+
+# Patterns in the standard error of a failed script that indicate a
+# transient (e.g. filesystem or network) problem, rather than a bug.
+DEFAULT_TRANSIENT_PATTERNS = [
+    r"Stale file handle",
+    r"Input/output error",
+    r"Resource temporarily unavailable",
+    r"Connection reset by peer",
+    r"Connection timed out",
+    r"HDF5 error.*(unable to open file|file locking)",
+]
+
+# Patterns in the standard error of a failed script that indicate that
+# it ran out of memory.
+OOM_PATTERNS = [
+    r"\bMemoryError\b",
+    r"Cannot allocate memory",
+    r"std::bad_alloc",
+]
+
+# Failure classes, from ``classify_failure``.
+FAILURE_CLASSES = ("timeout", "oom", "transient", "signal", "error")
+
+
+def classify_failure(
+    returncode: int,
+    stderr: str,
+    timed_out: bool = False,
+    transient_patterns: Optional[list[str]] = None,
+) -> str:
+    """
+    Classifies the failure of a script.
+
+    Parameters
+    ----------
+
+    returncode: int
+        The return code of the script. Negative values are the signal
+        that killed it.
+
+    stderr: str
+        The standard error of the script.
+
+    timed_out: bool
+        Whether the script was killed for exceeding its time limit.
+
+    transient_patterns: list[str], optional
+        Regular expressions that mark a failure as transient when found
+        in ``stderr``. Defaults to ``DEFAULT_TRANSIENT_PATTERNS``.
+
+    Returns
+    -------
+
+    failure_class: str
+        One of ``timeout``, ``oom`` (killed by the kernel's out of
+        memory killer, or raised a memory error), ``transient`` (matched
+        one of the ``transient_patterns``), ``signal`` (killed by any
+        other signal, e.g. a segmentation fault), or ``error`` (any
+        other failure, most likely a bug in the script).
+    """
+
+    if transient_patterns is None:
+        transient_patterns = DEFAULT_TRANSIENT_PATTERNS
+
+    if timed_out:
+        return "timeout"
+
+    # The out of memory killer sends SIGKILL; shells (and some batch
+    # systems) report this as 128 + 9.
+    if returncode in (-signal.SIGKILL, 128 + signal.SIGKILL):
+        return "oom"
+
+    if any(re.search(pattern, stderr) for pattern in OOM_PATTERNS):
+        return "oom"
+
+    if any(re.search(pattern, stderr) for pattern in transient_patterns):
+        return "transient"
+
+    if returncode < 0:
+        return "signal"
+
+    return "error"
+
+
+def get_available_memory() -> Optional[float]:
+    """
+    Gets the fraction of the memory of the node that is available, from
+    ``/proc/meminfo``, or ``None`` if this is not known (e.g. not on
+    Linux).
+    """
+
+    try:
+        with open(Path("/proc/meminfo"), "r") as handle:
+            meminfo = {
+                key: float(value.split()[0])
+                for key, value in (line.split(":", 1) for line in handle)
+            }
+
+        return meminfo["MemAvailable"] / meminfo["MemTotal"]
+    except (OSError, KeyError, ValueError, IndexError, ZeroDivisionError):
+        return None
+
+
+@attr.s(auto_attribs=False)
+class RetryPolicy:
+    """
+    Policy for retrying scripts whose failures are classified (with
+    ``classify_failure``) as ``retry_on``.
+
+    Retries are delayed by ``backoff`` seconds, doubling after each
+    retry of the same script. Before retrying a script that ran out of
+    memory, the policy also waits (for up to ``memory_wait`` seconds)
+    for at least ``min_available_memory`` of the node's memory to be
+    available, and such retries are ran one at a time when the same
+    policy is used by concurrent runs (e.g. in serve mode).
+    """
+
+    max_retries = attr.ib(type=int, default=2)
+    backoff = attr.ib(type=float, default=5.0)
+    retry_on = attr.ib(type=tuple[str, ...], default=("timeout", "oom", "transient"))
+    transient_patterns = attr.ib(
+        type=list[str], factory=lambda: list(DEFAULT_TRANSIENT_PATTERNS)
+    )
+    min_available_memory = attr.ib(type=float, default=0.25)
+    memory_wait = attr.ib(type=float, default=600.0)
+
+    memory_lock: Lock
+
+    def __attrs_post_init__(self):
+        """
+        Creates the lock for retries of scripts that ran out of memory.
+        """
+
+        self.memory_lock = Lock()
+
+    def should_retry(self, failure_class: str, retries: int) -> bool:
+        """
+        Whether to retry a script that has failed with ``failure_class``,
+        after already being retried ``retries`` times.
+        """
+
+        return failure_class in self.retry_on and retries < self.max_retries
+
+    def wait(
+        self, failure_class: str, retries: int, cancel: Optional[Event] = None
+    ) -> bool:
+        """
+        Waits before the retry number ``retries`` (starting from one) of
+        a script that failed with ``failure_class``.
+
+        Parameters
+        ----------
+
+        failure_class: str
+            The class of the failure, from ``classify_failure``.
+
+        retries: int
+            The number of the retry that is about to be made.
+
+        cancel: Event, optional
+            If this event is set, waiting stops early.
+
+        Returns
+        -------
+
+        proceed: bool
+            ``False`` if ``cancel`` was set while waiting, ``True``
+            otherwise.
+        """
+
+        def pause(seconds: float) -> bool:
+            if cancel is None:
+                sleep(seconds)
+                return True
+
+            return not cancel.wait(seconds)
+
+        if not pause(self.backoff * 2 ** (retries - 1)):
+            return False
+
+        if failure_class != "oom":
+            return True
+
+        start = perf_counter()
+
+        while perf_counter() - start < self.memory_wait:
+            available = get_available_memory()
+
+            if available is None or available >= self.min_available_memory:
+                break
+
+            if not pause(min(max(self.backoff, 1.0), 30.0)):
+                return False
+
+        return True
+
+    def limit(self, failure_class: Optional[str]) -> ContextManager:
+        """
+        Context to run a retry in, after a failure of ``failure_class``
+        (or ``None`` for the first attempt), which serialises retries of
+        scripts that ran out of memory.
+        """
+
+        return self.memory_lock if failure_class == "oom" else nullcontext()
@@ -2,6 +2,7 @@
 Functions that aid in the production of the HTML webpages.
 """
 
+import os
 from pathlib import Path
 from time import strftime
 from typing import Optional, Union
@@ -106,6 +107,8 @@ class WebpageCreator(object):
             creation_date=strftime(r"%Y-%m-%d"),
             sections={},
             runs=[],
+            pack=None,
+            lazy=False,
         )
 
         return
@@ -147,6 +150,31 @@ class WebpageCreator(object):
 
         self.variables.update(dict(page_name=page_name))
 
+    def add_pack(self, archive: Path):
+        """
+        Reference figures from a packed output archive (see
+        ``scrunner.pack``), rather than from individual files. Figures
+        in the archive are loaded by the page with HTTP range requests,
+        so the page must be served over HTTP. This must be called
+        before ``add_plots``.
+
+        Parameters
+        ----------
+        archive: Path
+            Path to the archive, which must be in the same directory
+            as the page.
+        """
+
+        from scrunner.pack import read_pack_index
+
+        self.variables["pack"] = dict(
+            filename=Path(archive).name,
+            index={
+                str(filename): list(location)
+                for filename, location in read_pack_index(archive).items()
+            },
+        )
+
     def add_plots(
         self,
         data: list[dict[str, Union[str, Path]]],
@@ -166,17 +194,22 @@ class WebpageCreator(object):
             is provided, only created figures will be displayed
             on the webpage. If not, then the page will contain
             blank spaces where failed plots should live (can be
-            useful for debugging).
+            useful for debugging). Figures in the archive given
+            to ``add_pack`` are also treated as created.
         """
 
         self.data = data
 
         output = {}
 
+        packed = self.variables["pack"]["index"] if self.variables["pack"] else {}
+
         for plot in data:
             if output_directory is not None:
                 valid_filenames = [
-                    x for x in plot["filenames"] if (output_directory / x).exists()
+                    x
+                    for x in plot["filenames"]
+                    if (output_directory / x).exists() or str(x) in packed
                 ]
             else:
                 valid_filenames = plot["filenames"]
@@ -197,6 +230,58 @@ class WebpageCreator(object):
 
         return
 
+    def add_diffs(
+        self,
+        diffs: list[dict[str, Union[str, Path, Optional[float]]]],
+        reference_directory: Path,
+        comparison_directory: Path,
+        output_directory: Path,
+    ):
+        """
+        Adds the differences between two runs, for use with the
+        ``diff_viewer.html`` template.
+
+        Parameters
+        ----------
+
+        diffs: list[dict[str, Union[str, Path, Optional[float]]]]
+            Result of ``scrunner.diff.diff_outputs()``.
+
+        reference_directory: Path
+            The output directory of the reference run.
+
+        comparison_directory: Path
+            The output directory of the run compared to the reference.
+
+        output_directory: Path
+            The directory that the page will be saved in.
+        """
+
+        output = []
+
+        for diff in diffs:
+            temp_output = diff.copy()
+
+            temp_output["reference"] = os.path.relpath(
+                reference_directory / diff["filename"], output_directory
+            )
+            temp_output["comparison"] = os.path.relpath(
+                comparison_directory / diff["filename"], output_directory
+            )
+            temp_output["id"] = f"diff{abs(hash(str(diff['filename'])))}"
+
+            output.append(temp_output)
+
+        self.variables.update(
+            dict(
+                diffs=output,
+                reference_directory=str(reference_directory),
+                comparison_directory=str(comparison_directory),
+            )
+        )
+
+        return
+
     def save_html(self, filename: str):
         """
         Saves the html in ``self.html`` to the filename provided.
@@ -208,3 +293,80 @@ class WebpageCreator(object):
 
         with open(filename, "w") as handle:
             handle.write(self.html)
+
+
+def create_webpage(
+    runner,
+    output_directory: Path,
+    file_type: str,
+    number_of_figures: int,
+    page_name: str = "ScRunner Output",
+    only_existing: bool = True,
+    pack: Optional[Path] = None,
+    lazy: bool = False,
+) -> WebpageCreator:
+    """
+    Creates, renders, and saves the ``index.html`` summary page for a
+    set of scripts that have been run.
+
+    Parameters
+    ----------
+
+    runner: ScriptRunner
+        The runner that was used to run the scripts.
+
+    output_directory: Path
+        The output directory that the scripts were run with. The page
+        is saved as ``index.html`` in this directory.
+
+    file_type: str
+        The file extension of the outputs.
+
+    number_of_figures: int
+        The number of figures that each script produced.
+
+    page_name: str
+        Name to put in the page title.
+
+    only_existing: bool
+        Whether to only show figures that exist in the output directory.
+        If ``False``, all figures that the scripts would produce are
+        shown. Defaults to ``True``.
+
+    pack: Path, optional
+        Path to a packed output archive, in the output directory, that
+        the figures should be loaded from.
+
+    lazy: bool
+        Whether the page should only load figures when they are
+        scrolled to, or their lightbox is opened, rather than all at
+        once. Defaults to ``False``.
+
+    Returns
+    -------
+
+    webpage: WebpageCreator
+        The webpage creator used to render the page.
+    """
+
+    webpage = WebpageCreator()
+    webpage.variables["lazy"] = lazy
+
+    webpage.add_metadata(page_name=page_name, additional_text=runner.captured_stdout)
+
+    if pack is not None:
+        webpage.add_pack(archive=pack)
+
+    webpage.add_plots(
+        data=runner.get_metadata(
+            file_type=file_type,
+            number_of_figures=number_of_figures,
+        ),
+        output_directory=output_directory if only_existing else None,
+    )
+
+    webpage.render_webpage()
+
+    webpage.save_html(filename=output_directory / "index.html")
+
+    return webpage
@@ -0,0 +1,304 @@
+"""
+Packing of outputs into a single archive, for filesystems (and web
+hosts) that do not cope well with many small files.
+
+Archives are uncompressed zip files, so they can be unpacked cheaply
+with any zip tool (or ``unpack_outputs``), and the data for each
+output lives at a fixed offset in the archive. This allows the webpage
+to load individual figures from the archive with HTTP range requests.
+"""
+
+import argparse as ap
+import mimetypes
+import os
+import struct
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from zipfile import ZIP_STORED, ZipFile
+
+from scrunner.runner import PROFILE_DIRECTORY, STATE_FILENAME
+
+# Size of the fixed part of a zip local file header; the file name and
+# extra field lengths are stored as the last two 2-byte fields.
+LOCAL_HEADER_SIZE = 30
+
+
+def pack_outputs(
+    output_directory: Path,
+    archive_name: str = "outputs.zip",
+    remove: bool = True,
+) -> Path:
+    """
+    Packs all of the files in the output directory (apart from
+    ``index.html``, the runner state, and profiles, which the webpage
+    links to directly) into a single archive in that directory.
+
+    If the archive already exists, any outputs in it that have not
+    been re-created since it was packed are kept.
+
+    Parameters
+    ----------
+
+    output_directory: Path
+        The output directory containing the outputs to pack.
+
+    archive_name: str
+        The file name of the archive. Defaults to ``outputs.zip``.
+
+    remove: bool
+        Whether to remove the individual files once they have been
+        packed. Defaults to ``True``.
+
+    Returns
+    -------
+
+    archive: Path
+        The path to the archive.
+    """
+
+    output_directory = Path(output_directory)
+    archive = output_directory / archive_name
+    temporary_archive = output_directory / f".{archive_name}.tmp"
+
+    unpacked = [
+        archive,
+        temporary_archive,
+        output_directory / "index.html",
+        output_directory / STATE_FILENAME,
+    ]
+
+    filenames = sorted(
+        path
+        for path in output_directory.rglob("*")
+        if path.is_file()
+        and path not in unpacked
+        and path.relative_to(output_directory).parts[0] != PROFILE_DIRECTORY
+    )
+    names = {path.relative_to(output_directory).as_posix() for path in filenames}
+
+    with ZipFile(temporary_archive, "w", compression=ZIP_STORED) as handle:
+        for path in filenames:
+            handle.write(path, arcname=path.relative_to(output_directory).as_posix())
+
+        if archive.exists():
+            with ZipFile(archive, "r") as old_handle:
+                for info in old_handle.infolist():
+                    if info.filename not in names:
+                        handle.writestr(info, old_handle.read(info))
+
+    os.replace(temporary_archive, archive)
+
+    if remove:
+        for path in filenames:
+            path.unlink()
+
+    return archive
+
+
+def read_pack_index(archive: Path) -> dict[Path, tuple[int, int, str]]:
+    """
+    Reads the locations of the outputs in an archive.
+
+    Parameters
+    ----------
+
+    archive: Path
+        The path to the archive.
+
+    Returns
+    -------
+
+    index: dict[Path, tuple[int, int, str]]
+        The offset (in bytes) of the data in the archive, the size of
+        the data, and the MIME type, for each (relative) output path.
+    """
+
+    index = {}
+
+    with open(archive, "rb") as raw_handle, ZipFile(raw_handle, "r") as handle:
+        for info in handle.infolist():
+            if info.is_dir() or info.compress_type != ZIP_STORED:
+                continue
+
+            raw_handle.seek(info.header_offset)
+            header = raw_handle.read(LOCAL_HEADER_SIZE)
+            name_length, extra_length = struct.unpack("<HH", header[-4:])
+
+            index[Path(info.filename)] = (
+                info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length,
+                info.file_size,
+                mimetypes.guess_type(info.filename)[0] or "application/octet-stream",
+            )
+
+    return index
+
+
+def unpack_outputs(archive: Path, output_directory: Optional[Path] = None):
+    """
+    Unpacks an archive back into individual files.
+
+    Parameters
+    ----------
+
+    archive: Path
+        The path to the archive.
+
+    output_directory: Path, optional
+        The directory to unpack to. Defaults to the directory
+        containing the archive.
+    """
+
+    archive = Path(archive)
+    output_directory = archive.parent if output_directory is None else output_directory
+
+    with ZipFile(archive, "r") as handle:
+        handle.extractall(output_directory)
+
+    return
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file request handler that supports single byte-range
+    requests, as used by pages that load figures from an archive.
+    """
+
+    def send_head(self):
+        """
+        Sends the headers for a request, honouring a ``Range`` header
+        of the form ``bytes=start-end``, ``bytes=start-``, or (for the
+        last ``length`` bytes) ``bytes=-length``.
+        """
+
+        byte_range = self.headers.get("Range", "")
+        path = Path(self.translate_path(self.path))
+
+        if not byte_range.startswith("bytes=") or not path.is_file():
+            return super().send_head()
+
+        size = path.stat().st_size
+
+        try:
+            first, last = byte_range[len("bytes=") :].split("-")
+
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(0, size - int(last))
+                end = size - 1
+        except ValueError:
+            return super().send_head()
+
+        if start > end:
+            self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            return None
+
+        handle = open(path, "rb")
+        handle.seek(start)
+
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        self.range_remaining = end - start + 1
+
+        return handle
+
+    def copyfile(self, source, outputfile):
+        """
+        Copies only the requested range for range requests.
+        """
+
+        remaining = getattr(self, "range_remaining", None)
+
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+
+        while remaining > 0:
+            chunk = source.read(min(remaining, 64 * 1024))
+
+            if not chunk:
+                break
+
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+        self.range_remaining = None
+
+        return
+
+
+def serve_outputs(output_directory: Path, host: str = "127.0.0.1", port: int = 8000):
+    """
+    Serves an output directory (for instance, one containing a packed
+    archive) over HTTP, with support for range requests, until
+    interrupted.
+
+    Parameters
+    ----------
+
+    output_directory: Path
+        The output directory to serve.
+
+    host: str
+        The host to bind to. Defaults to ``127.0.0.1``.
+
+    port: int
+        The port to serve on. Defaults to 8000.
+    """
+
+    server = ThreadingHTTPServer(
+        (host, port),
+        partial(RangeRequestHandler, directory=str(output_directory)),
+    )
+
+    print(f"Serving {output_directory} at http://{host}:{port}/")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return
+
+
+if __name__ == "__main__":
+    parser = ap.ArgumentParser(
+        description=(
+            "Tools for packed ScRunner output archives. Use 'serve' to view "
+            + "a packed output directory locally, or 'unpack' to extract "
+            + "the archive into individual files."
+        )
+    )
+
+    parser.add_argument("command", choices=["serve", "unpack"])
+
+    parser.add_argument(
+        "path",
+        help="Output directory (for serve) or archive (for unpack).",
+        type=Path,
+    )
+
+    parser.add_argument(
+        "--port",
+        help="Port to serve on.",
+        type=int,
+        required=False,
+        default=8000,
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve_outputs(output_directory=args.path, port=args.port)
+    else:
+        unpack_outputs(archive=args.path)
@@ -0,0 +1,265 @@
+"""
+Profiling of scripts with ``cProfile``, and summaries of the profiles
+for the webpage.
+
+Scripts are profiled by running them through this module:
+
+.. code::
+
+   python -m scrunner.profiling output.prof script.py [script arguments]
+
+Unlike ``python -m cProfile``, this preserves the exit code of scripts
+that call ``sys.exit``, so that failures are still reported. It also
+profiles any threads that the script starts (such as the figure writers
+used by ``ScriptArgumentParser.save_figure``), merging their profiles
+with that of the main thread. The profile is written as the interpreter
+exits, after any pending figures have been written.
+"""
+
+import atexit
+import cProfile
+import pstats
+import runpy
+import sys
+import threading
+from pathlib import Path
+from typing import Union
+
+# Stacks deeper than this are truncated in the collapsed stack output.
+MAX_STACK_DEPTH = 64
+
+# Callers that account for less than this fraction of the total time
+# are not expanded in the collapsed stack output, which bounds its size.
+MIN_STACK_FRACTION = 1e-3
+
+
+def format_function(function: tuple[str, int, str]) -> str:
+    """
+    Formats a ``pstats`` function key, ``(filename, line, name)``.
+    """
+
+    filename, line, name = function
+
+    if filename == "~":
+        # Built-in functions.
+        return name
+
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def get_top_functions(
+    profile: Path, n_functions: int = 10
+) -> list[dict[str, Union[str, int, float]]]:
+    """
+    Gets the functions that the most time was spent in.
+
+    Parameters
+    ----------
+
+    profile: Path
+        Path to the ``cProfile`` dump.
+
+    n_functions: int
+        The number of functions to return. Defaults to 10.
+
+    Returns
+    -------
+
+    functions: list[dict[str, Union[str, int, float]]]
+        The ``name``, number of ``calls``, time spent in the function
+        itself (``own_time``) and time including the functions that it
+        calls (``total_time``), for the functions with the highest
+        ``own_time``.
+    """
+
+    stats = pstats.Stats(str(profile)).stats
+
+    functions = [
+        dict(
+            name=format_function(function),
+            calls=n_calls,
+            own_time=own_time,
+            total_time=total_time,
+        )
+        for function, (_, n_calls, own_time, total_time, _) in stats.items()
+    ]
+
+    return sorted(functions, key=lambda x: x["own_time"], reverse=True)[:n_functions]
+
+
+def write_collapsed_stacks(profile: Path, output: Path):
+    """
+    Writes a profile as collapsed stacks (``a;b;c <microseconds>`` per
+    line), as read by ``flamegraph.pl``, speedscope, and similar tools.
+
+    ``cProfile`` only records which functions called which, not full
+    stacks, so the stacks are reconstructed by splitting the time spent
+    in each function between its callers in proportion to the time
+    that each caller spent calling it.
+
+    Parameters
+    ----------
+
+    profile: Path
+        Path to the ``cProfile`` dump.
+
+    output: Path
+        Path to write the collapsed stacks to.
+    """
+
+    stats = pstats.Stats(str(profile)).stats
+    names = {function: format_function(function) for function in stats}
+    stacks = {}
+
+    min_weight = MIN_STACK_FRACTION * sum(x[2] for x in stats.values())
+
+    def add_stacks(function, stack: list, weight: float):
+        remaining = weight
+
+        if function in stats and len(stack) < MAX_STACK_DEPTH:
+            # Skip recursion, attributing its time to the outermost call.
+            callers = {
+                caller: timings[3]
+                for caller, timings in stats[function][4].items()
+                if caller not in stack
+            }
+            total = sum(callers.values())
+
+            for caller, total_time in callers.items() if total > 0.0 else []:
+                caller_weight = weight * total_time / total
+
+                if caller_weight >= min_weight:
+                    stack.append(caller)
+                    add_stacks(caller, stack, caller_weight)
+                    stack.pop()
+
+                    remaining -= caller_weight
+
+        if remaining > 0.5e-6:
+            key = ";".join(names.get(x, format_function(x)) for x in reversed(stack))
+            stacks[key] = stacks.get(key, 0.0) + remaining
+
+    for function, (_, _, own_time, _, _) in stats.items():
+        if own_time > 0.0:
+            add_stacks(function, [function], own_time)
+
+    with open(output, "w") as handle:
+        for stack, weight in sorted(stacks.items()):
+            microseconds = int(round(weight * 1e6))
+
+            if microseconds > 0:
+                handle.write(f"{stack} {microseconds}\n")
+
+    return
+
+
+def summarise_profile(
+    profile: Path, output_directory: Path, n_functions: int = 10
+) -> dict[str, Union[Path, list]]:
+    """
+    Writes the collapsed stacks for a profile, and summarises it for
+    the webpage.
+
+    Parameters
+    ----------
+
+    profile: Path
+        Path to the ``cProfile`` dump, within the output directory.
+
+    output_directory: Path
+        The output directory.
+
+    n_functions: int
+        The number of hot functions to include. Defaults to 10.
+
+    Returns
+    -------
+
+    summary: dict[str, Union[Path, list]]
+        The paths to the ``profile`` and ``collapsed`` stacks, relative
+        to the output directory, and the ``top`` functions.
+    """
+
+    collapsed = profile.with_suffix(".collapsed")
+    write_collapsed_stacks(profile=profile, output=collapsed)
+
+    return dict(
+        profile=profile.relative_to(output_directory),
+        collapsed=collapsed.relative_to(output_directory),
+        top=get_top_functions(profile=profile, n_functions=n_functions),
+    )
+
+
+def profile_threads() -> list[cProfile.Profile]:
+    """
+    Profiles every thread that is started from now on, each with its own
+    profiler. From Python 3.12, ``cProfile`` already records calls made
+    by all threads, and only one profiler may be active at once, so this
+    does nothing. Threads whose profiler cannot be enabled are ran
+    without being profiled.
+
+    Returns
+    -------
+
+    profilers: list[cProfile.Profile]
+        List that the profiler of each thread is appended to once the
+        thread has finished.
+    """
+
+    profilers = []
+
+    if sys.version_info >= (3, 12):
+        return profilers
+
+    lock = threading.Lock()
+    run = threading.Thread.run
+
+    def profiled_run(thread: threading.Thread):
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active.
+            run(thread)
+            return
+
+        try:
+            run(thread)
+        finally:
+            profiler.disable()
+
+            with lock:
+                profilers.append(profiler)
+
+    threading.Thread.run = profiled_run
+
+    return profilers
+
+
+if __name__ == "__main__":
+    output, script, *arguments = sys.argv[1:]
+
+    # Mimic running ``python script.py`` directly.
+    sys.argv = [script, *arguments]
+    sys.path[0] = str(Path(script).parent.resolve())
+
+    profiler = cProfile.Profile()
+    thread_profilers = profile_threads()
+
+    def dump_stats():
+        # Registered before the script runs, so that this is called after
+        # the script's own exit handlers (e.g. flushing figures). Thread
+        # pools are joined before any exit handlers are called.
+        stats = pstats.Stats(profiler)
+
+        for thread_profiler in thread_profilers:
+            # Threads that made no calls have no data to add.
+            if thread_profiler.getstats():
+                stats.add(thread_profiler)
+
+        stats.dump_stats(output)
+
+    atexit.register(dump_stats)
+
+    profiler.runcall(runpy.run_path, script, run_name="__main__")
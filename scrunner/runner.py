@@ -3,16 +3,52 @@ Script runner main object.
 """
 
 import json
+import os
+import signal
 import sys
+from fnmatch import fnmatchcase
 from pathlib import Path
-from subprocess import CalledProcessError, run
+from subprocess import (
+    PIPE,
+    CalledProcessError,
+    CompletedProcess,
+    Popen,
+    TimeoutExpired,
+)
+from threading import Event
 from time import perf_counter
 from typing import Optional, Union
 
 import attr
 
+from scrunner.events import EventStream, MetricsExporter, get_child_resources
+from scrunner.failures import RetryPolicy, classify_failure
 from scrunner.scripts import Output, Script
 
+# File in the output directory that keeps the captured standard output,
+# profiles, and retries, of each script, so that pages can be re-created after
+# running only some of the scripts.
+STATE_FILENAME = "scrunner.json"
+
+# Directory in the output directory that profiles of scripts are saved in.
+PROFILE_DIRECTORY = "profiles"
+
+
+def unlink_shared(path: Path):
+    """
+    Removes a file if it is a symbolic link, or has other hard links
+    (e.g. to an object in a ``scrunner.store.ObjectStore``), so that
+    re-creating it does not modify the file that it is shared with.
+    """
+
+    try:
+        if path.is_symlink() or path.stat().st_nlink > 1:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+
+    return
+
 
 @attr.s(auto_attribs=False)
 class ScriptRunner:
@@ -33,7 +69,9 @@ class ScriptRunner:
     path = attr.ib(type=Path, converter=Path)
     scripts: list[Script]
     script_paths: list[Path]
-    captured_stdout: str
+    script_stdout: dict[Path, str]
+    script_profiles: dict[Path, dict]
+    script_retries: dict[Path, list[str]]
 
     def __attrs_post_init__(self):
         """
@@ -41,7 +79,23 @@ class ScriptRunner:
         """
 
         self.scripts, self.script_paths = self.parse_scripts()
-        self.captured_stdout = ""
+        self.script_stdout = {}
+        self.script_profiles = {}
+        self.script_retries = {}
+
+    @property
+    def captured_stdout(self) -> str:
+        """
+        The captured standard output of all scripts that have
+        ``capture_stdout`` set, in the order that the scripts are
+        run in.
+        """
+
+        return "".join(
+            self.script_stdout[script_path]
+            for script_path in self.script_paths
+            if script_path in self.script_stdout
+        )
 
     def parse_scripts(self) -> list[Script]:
         """
@@ -91,6 +145,9 @@ class ScriptRunner:
                 created_by=parsed_frontmatter.get("created_by", "Unknown"),
                 contact_email=parsed_frontmatter.get("contact_email", "Unknown"),
                 capture_stdout=parsed_frontmatter.get("capture_stdout", False),
+                profile=parsed_frontmatter.get("profile", False),
+                tags=parsed_frontmatter.get("tags", []),
+                requires=parsed_frontmatter.get("requires", []),
                 outputs=[
                     Output(
                         filename=output["filename"],
@@ -107,6 +164,200 @@ class ScriptRunner:
 
         return scripts, script_paths
 
+    def find_script(self, name: Union[str, Path]) -> Optional[Path]:
+        """
+        Finds a script by its path, file name, file name without the
+        extension, or the name given in its frontmatter.
+
+        Parameters
+        ----------
+
+        name: Union[str, Path]
+            The path or name of the script.
+
+        Returns
+        -------
+
+        script_path: Path, optional
+            The path of the script, or ``None`` if there is no such
+            script.
+        """
+
+        for script, script_path in zip(self.scripts, self.script_paths):
+            if name == script_path or str(name) in (
+                str(script_path),
+                script_path.name,
+                script_path.stem,
+                script.name,
+            ):
+                return script_path
+
+        return None
+
+    def select(
+        self,
+        outputs: Optional[list[str]] = None,
+        scripts: Optional[list[Union[str, Path]]] = None,
+        tags: Optional[list[str]] = None,
+    ) -> list[Path]:
+        """
+        Selects the scripts to run, along with the scripts that they
+        require (given by ``requires`` in their frontmatter), in the
+        order that they should be ran in: required scripts are always
+        ran before the scripts that require them, and otherwise the
+        order of ``script_paths`` is kept.
+
+        If no selectors are given, all scripts are selected. Otherwise,
+        a script is selected if it matches any of the selectors.
+
+        Parameters
+        ----------
+
+        outputs: list[str], optional
+            Glob patterns (e.g. ``stellar_*``) matched against the
+            ``filename`` of each of the outputs of the scripts.
+
+        scripts: list[Union[str, Path]], optional
+            Paths or names of scripts (see ``find_script``).
+
+        tags: list[str], optional
+            Tags, given by ``tags`` in the frontmatter of the scripts.
+
+        Returns
+        -------
+
+        script_paths: list[Path]
+            The paths of the selected scripts, and their requirements.
+        """
+
+        if outputs is None and scripts is None and tags is None:
+            selected = set(self.script_paths)
+        else:
+            selected = set()
+
+            for name in scripts or []:
+                script_path = self.find_script(name)
+
+                if script_path is None:
+                    raise RuntimeError(f"Unable to find script {name}.")
+
+                selected.add(script_path)
+
+            for script, script_path in zip(self.scripts, self.script_paths):
+                if any(tag in script.tags for tag in tags or []) or any(
+                    fnmatchcase(output.filename, pattern)
+                    for output in script.outputs
+                    for pattern in outputs or []
+                ):
+                    selected.add(script_path)
+
+        requirements = {}
+
+        for script, script_path in zip(self.scripts, self.script_paths):
+            requirements[script_path] = []
+
+            for name in script.requires:
+                required_path = self.find_script(name)
+
+                if required_path is None:
+                    raise RuntimeError(
+                        f"Unable to find script {name}, required by {script_path}."
+                    )
+
+                requirements[script_path].append(required_path)
+
+        ordered = []
+        visiting = set()
+
+        def visit(script_path: Path):
+            if script_path in ordered:
+                return
+
+            if script_path in visiting:
+                raise RuntimeError(
+                    f"Circular requirements between scripts, involving {script_path}."
+                )
+
+            visiting.add(script_path)
+
+            for required_path in requirements[script_path]:
+                visit(required_path)
+
+            visiting.remove(script_path)
+            ordered.append(script_path)
+
+        for script_path in self.script_paths:
+            if script_path in selected:
+                visit(script_path)
+
+        return ordered
+
+    def save_state(self, output_directory: Path):
+        """
+        Saves the captured standard output, profile summaries, and
+        retries, of the scripts to the output directory, so that they can be
+        restored with ``load_state`` when only some scripts are re-ran.
+        """
+
+        state = dict(
+            stdout={
+                script_path.name: stdout
+                for script_path, stdout in self.script_stdout.items()
+            },
+            profiles={
+                script_path.name: profile
+                for script_path, profile in self.script_profiles.items()
+            },
+            retries={
+                script_path.name: retries
+                for script_path, retries in self.script_retries.items()
+            },
+        )
+
+        path = Path(output_directory) / STATE_FILENAME
+        temporary = path.with_name(f".{path.name}.tmp")
+
+        with open(temporary, "w") as handle:
+            json.dump(state, handle, default=str)
+
+        os.replace(temporary, path)
+
+        return
+
+    def load_state(self, output_directory: Path):
+        """
+        Loads the state saved by ``save_state``. Only information about
+        scripts that have not been ran by this runner is loaded. This
+        should be called before ``run``, which replaces (or clears) the
+        information about the scripts that it runs.
+        """
+
+        path = Path(output_directory) / STATE_FILENAME
+
+        if not path.exists():
+            return
+
+        with open(path, "r") as handle:
+            state = json.load(handle)
+
+        for script_path in self.script_paths:
+            if script_path.name in state["stdout"]:
+                self.script_stdout.setdefault(
+                    script_path, state["stdout"][script_path.name]
+                )
+
+            if script_path.name in state["profiles"]:
+                self.script_profiles.setdefault(
+                    script_path, state["profiles"][script_path.name]
+                )
+
+            if script_path.name in state.get("retries", {}):
+                self.script_retries.setdefault(
+                    script_path, state["retries"][script_path.name]
+                )
+
+        return
+
     def get_metadata(
         self, file_type: str, number_of_figures: int
     ) -> list[dict[str, Union[str, Path]]]:
@@ -131,17 +382,67 @@ class ScriptRunner:
 
         metadata: list[dict[str, Union[str, Path]]]
             A metadata dictionary for the output files that this will produce.
+            Outputs of scripts that have been profiled also contain the
+            ``profile`` summary, and outputs of scripts that were retried
+            contain the classes of the failures that caused the
+            ``retries``.
         """
         metadata = []
 
-        for script in self.scripts:
-            metadata = metadata + script.get_metadata(
+        for script, script_path in zip(self.scripts, self.script_paths):
+            script_metadata = script.get_metadata(
                 file_type=file_type,
                 number_of_figures=number_of_figures,
             )
 
+            if script_path in self.script_profiles:
+                for output_metadata in script_metadata:
+                    output_metadata["profile"] = self.script_profiles[script_path]
+
+            if self.script_retries.get(script_path, []):
+                for output_metadata in script_metadata:
+                    output_metadata["retries"] = self.script_retries[script_path]
+
+            metadata = metadata + script_metadata
+
         return metadata
 
+    def get_output_scripts(
+        self, file_type: str, number_of_figures: int
+    ) -> dict[Path, Path]:
+        """
+        Gets the script that produces each of the outputs.
+
+        Parameters
+        ----------
+
+        file_type: str
+            The file extension of the outputs.
+
+        number_of_figures: int
+            The total number of outputs that will be used in the
+            generation of these figures.
+
+
+        Returns
+        -------
+
+        output_scripts: dict[Path, Path]
+            The path of the script that produces each (relative)
+            output file path.
+        """
+
+        output_scripts = {}
+
+        for script, script_path in zip(self.scripts, self.script_paths):
+            for output in script.outputs:
+                for filename in output.get_paths(
+                    file_type=file_type, number_of_figures=number_of_figures
+                ):
+                    output_scripts[filename] = script_path
+
+        return output_scripts
+
     def run(
         self,
         data: list[Path],
@@ -150,7 +451,16 @@ class ScriptRunner:
         number_of_figures: int,
         stylesheet: str,
         interpreter: Optional[str] = None,
-    ):
+        scripts: Optional[list[Union[str, Path]]] = None,
+        cancel: Optional[Event] = None,
+        events: Optional[EventStream] = None,
+        metrics: Optional[MetricsExporter] = None,
+        profile: Optional[list[Path]] = None,
+        outputs: Optional[list[str]] = None,
+        tags: Optional[list[str]] = None,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+    ) -> bool:
         """
         Run the scripts!
 
@@ -173,6 +483,58 @@ class ScriptRunner:
 
         stylesheet: str
             The matplotlib stylesheet to use.
+
+        interpreter: str, optional
+            The python interpreter to run the scripts with. Defaults
+            to the current interpreter.
+
+        scripts: list[Union[str, Path]], optional
+            Paths or names of the scripts to run. Along with ``outputs``
+            and ``tags``, this selects the scripts to run (and the
+            scripts that they require) with ``select``. Defaults to
+            all scripts in ``script_paths``.
+
+        cancel: Event, optional
+            If this event is set while the scripts are running, the
+            currently running script is killed and no further scripts
+            are started.
+
+        events: EventStream, optional
+            Stream to write events to as scripts start and finish.
+
+        metrics: MetricsExporter, optional
+            Metrics to update as scripts start and finish.
+
+        profile: list[Path], optional
+            Paths of scripts to run under ``cProfile``, in addition to
+            those with ``profile`` set in their frontmatter. The profiles,
+            and collapsed stacks for flame graphs, are saved in
+            ``profiles/`` in the output directory, and summarised in
+            ``script_profiles``.
+
+        outputs: list[str], optional
+            Glob patterns for the filenames of the outputs to produce.
+
+        tags: list[str], optional
+            Tags of the scripts to run.
+
+        timeout: float, optional
+            Time limit (in seconds) for each script. Scripts that exceed
+            it are killed, and their failure classed as a ``timeout``.
+
+        retry: RetryPolicy, optional
+            Policy for retrying scripts whose failures are likely to be
+            transient (see ``scrunner.failures.classify_failure``).
+            Defaults to ``RetryPolicy()``; use
+            ``RetryPolicy(max_retries=0)`` to never retry. The classes
+            of the failures that caused each script to be retried are
+            kept in ``script_retries``.
+
+        Returns
+        -------
+
+        completed: bool
+            ``False`` if the run was cancelled, ``True`` otherwise.
         """
 
         arguments = [
@@ -189,14 +551,39 @@ class ScriptRunner:
         ]
 
         interpreter = sys.executable if interpreter is None else interpreter
+        retry = RetryPolicy() if retry is None else retry
 
         failures = []
         warnings = []
         n_failures = 0
         n_warnings = 0
+        n_retries = 0
+        n_retried = 0
+        n_run = 0
 
-        for script, script_path in zip(self.scripts, self.script_paths):
-            start = perf_counter()
+        to_run_paths = self.select(outputs=outputs, scripts=scripts, tags=tags)
+        scripts_by_path = dict(zip(self.script_paths, self.scripts))
+
+        run_start = perf_counter()
+
+        if events is not None:
+            events.emit("run_started", n_scripts=len(to_run_paths))
+
+        if metrics is not None:
+            metrics.run_started(n_scripts=len(to_run_paths))
+
+        for script_path in to_run_paths:
+            script = scripts_by_path[script_path]
+
+            if events is not None:
+                events.emit(
+                    "script_started",
+                    script=script_path,
+                    queue_depth=len(to_run_paths) - n_run - 1,
+                )
+
+            if metrics is not None:
+                metrics.script_started()
 
             to_run = [
                 str(interpreter),
@@ -204,15 +591,122 @@ class ScriptRunner:
                 *arguments,
             ]
 
-            complete = run(
-                to_run,
-                capture_output=True,
-                encoding="utf-8",
-                check=False,
+            profile_path = (
+                Path(output_directory) / PROFILE_DIRECTORY / f"{script_path.stem}.prof"
             )
-            end = perf_counter()
+
+            if script.profile or (profile is not None and script_path in profile):
+                profile_path.parent.mkdir(parents=True, exist_ok=True)
+                to_run[1:1] = ["-m", "scrunner.profiling", str(profile_path)]
+            else:
+                profile_path = None
+
+            # Outputs may be linked to shared files (e.g. by an object
+            # store), which must not be written through.
+            for output_metadata in script.get_metadata(
+                file_type=file_type, number_of_figures=number_of_figures
+            ):
+                for filename in output_metadata["filenames"]:
+                    unlink_shared(Path(output_directory) / filename)
+
+            if profile_path is not None:
+                unlink_shared(profile_path)
+                unlink_shared(profile_path.with_suffix(".collapsed"))
+
+            retries = []
+            failure_class = None
+
+            while True:
+                resources = get_child_resources()
+                start = perf_counter()
+
+                with retry.limit(retries[-1] if retries else None):
+                    try:
+                        complete = self.run_script(
+                            to_run=to_run, cancel=cancel, timeout=timeout
+                        )
+                        timed_out = False
+                    except TimeoutExpired as error:
+                        complete = CompletedProcess(
+                            args=to_run,
+                            returncode=-signal.SIGKILL,
+                            stdout=error.output or "",
+                            stderr=error.stderr or "",
+                        )
+                        timed_out = True
+
+                end = perf_counter()
+
+                if complete is None or complete.returncode == 0:
+                    break
+
+                failure_class = classify_failure(
+                    returncode=complete.returncode,
+                    stderr=complete.stderr,
+                    timed_out=timed_out,
+                    transient_patterns=retry.transient_patterns,
+                )
+
+                if not retry.should_retry(failure_class, len(retries)):
+                    break
+
+                retries.append(failure_class)
+                n_retries += 1
+
+                print(
+                    f"Retrying {script_path} after {failure_class} failure "
+                    f"(retry {len(retries)} of {retry.max_retries})"
+                )
+
+                if events is not None:
+                    events.emit(
+                        "script_retrying",
+                        script=script_path,
+                        failure_class=failure_class,
+                        retry=len(retries),
+                        duration=end - start,
+                        returncode=complete.returncode,
+                        stderr=complete.stderr,
+                    )
+
+                if metrics is not None:
+                    metrics.script_retried(failure_class=failure_class)
+
+                if not retry.wait(failure_class, len(retries), cancel=cancel):
+                    complete = None
+                    break
+
+            if complete is None:
+                print(f"Run cancelled after {n_run} scripts")
+
+                if events is not None:
+                    events.emit("run_cancelled", n_scripts=n_run)
+
+                if metrics is not None:
+                    metrics.run_finished()
+
+                return False
+
+            n_run += 1
+            n_retried += 1 if retries else 0
+            self.script_retries[script_path] = retries
 
             script_time = end - start
+            status = "success"
+
+            if profile_path is not None and profile_path.exists():
+                # Imported here, as importing scrunner must not import the
+                # profiling module before it is ran with python -m.
+                from scrunner.profiling import summarise_profile
+
+                self.script_profiles[script_path] = dict(
+                    script=script_path.name,
+                    **summarise_profile(
+                        profile=profile_path, output_directory=Path(output_directory)
+                    ),
+                )
+            else:
+                self.script_profiles.pop(script_path, None)
 
             output_text = (
                 f"Output:\n{complete.stdout}\n" if len(complete.stdout) > 0 else ""
@@ -220,24 +714,75 @@ class ScriptRunner:
             error_text = (
                 f"Errors:\n{complete.stderr}\n" if len(complete.stderr) > 0 else ""
             )
+            retry_text = (
+                f"Retried after failures: {', '.join(retries)}\n" if retries else ""
+            )
 
             try:
                 complete.check_returncode()
                 if "Warn" in complete.stdout or "Warn" in complete.stderr:
                     warnings.append(
-                        f"{script_path}\n{output_text}{error_text}\n"
+                        f"{script_path}\n{output_text}{error_text}{retry_text}\n"
                         f"Run just this script with {' '.join(to_run)}."
                     )
                     n_warnings += 1
+                    status = "warning"
 
                 if script.capture_stdout:
-                    self.captured_stdout += complete.stdout
+                    self.script_stdout[script_path] = complete.stdout
+                else:
+                    self.script_stdout.pop(script_path, None)
             except CalledProcessError:
+                # Do not keep showing the output of an earlier run.
+                self.script_stdout.pop(script_path, None)
+
                 n_failures += 1
                 failures.append(
-                    f"{script_path}\n{output_text}{error_text}\n"
+                    f"{script_path} ({failure_class})\n"
+                    f"{output_text}{error_text}{retry_text}\n"
                     f"Run just this script with {' '.join(to_run)}."
                 )
+                status = "failure"
+
+            if events is not None:
+                usage = get_child_resources()
+
+                events.emit(
+                    dict(
+                        success="script_finished",
+                        warning="script_warning",
+                        failure="script_failed",
+                    )[status],
+                    script=script_path,
+                    duration=script_time,
+                    returncode=complete.returncode,
+                    user_time=(
+                        usage.get("user_time", 0) - resources.get("user_time", 0)
+                    ),
+                    system_time=(
+                        usage.get("system_time", 0) - resources.get("system_time", 0)
+                    ),
+                    max_rss_so_far=usage.get("max_rss", None),
+                    stderr=complete.stderr if status != "success" else "",
+                    failure_class=failure_class if status == "failure" else None,
+                    retries=len(retries),
+                )
+
+            if metrics is not None:
+                metrics.script_finished(duration=script_time, status=status)
+
+        if events is not None:
+            events.emit(
+                "run_finished",
+                n_scripts=n_run,
+                n_failures=n_failures,
+                n_warnings=n_warnings,
+                n_retries=n_retries,
+                duration=perf_counter() - run_start,
+            )
+
+        if metrics is not None:
+            metrics.run_finished()
 
         if n_warnings > 0:
             print("Warnings:")
@@ -247,9 +792,72 @@ class ScriptRunner:
             print("Failures:")
             print("\n".join(failures))
 
-        print(f"Successfully completed {len(self.scripts) - n_failures} scripts")
+        print(f"Successfully completed {n_run - n_failures} scripts")
         print(f"There were {n_failures} failures")
         print(f"There were {n_warnings} scripts that raised warnings")
 
+        if n_retries > 0:
+            print(f"There were {n_retries} retries of {n_retried} scripts")
+
         if n_warnings + n_failures > 0:
             print("Error and warning information are available in stdout above.")
+
+        return True
+
+    def run_script(
+        self,
+        to_run: list[str],
+        cancel: Optional[Event] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[CompletedProcess]:
+        """
+        Runs a single script, capturing its output.
+
+        Parameters
+        ----------
+
+        to_run: list[str]
+            The full command to run, including the interpreter.
+
+        cancel: Event, optional
+            If this event is set while the script is running, the
+            script is killed.
+
+        timeout: float, optional
+            Time limit (in seconds) for the script. If it is exceeded,
+            the script is killed and ``TimeoutExpired`` is raised, with
+            the output that was captured.
+
+        Returns
+        -------
+
+        complete: CompletedProcess, optional
+            The completed process, or ``None`` if it was cancelled.
+        """
+
+        with Popen(to_run, stdout=PIPE, stderr=PIPE, encoding="utf-8") as process:
+            if cancel is None and timeout is None:
+                stdout, stderr = process.communicate()
+            else:
+                start = perf_counter()
+
+                while True:
+                    try:
+                        stdout, stderr = process.communicate(timeout=0.1)
+                        break
+                    except TimeoutExpired:
+                        if cancel is not None and cancel.is_set():
+                            process.kill()
+                            process.communicate()
+                            return None
+
+                        if timeout is not None and perf_counter() - start > timeout:
+                            process.kill()
+                            stdout, stderr = process.communicate()
+                            raise TimeoutExpired(
+                                to_run, timeout, output=stdout, stderr=stderr
+                            )
+
+        return CompletedProcess(
+            args=to_run, returncode=process.returncode, stdout=stdout, stderr=stderr
+        )
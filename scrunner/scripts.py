@@ -114,6 +114,9 @@ class Script:
     contact_email: str
     capture_stdout: bool = attr.ib(converter=anytobool)
     outputs: list[Output]
+    profile: bool = attr.ib(converter=anytobool, default=False)
+    tags: list[str] = attr.ib(factory=list)
+    requires: list[str] = attr.ib(factory=list)
 
     def get_metadata(
         self,
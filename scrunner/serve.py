@@ -0,0 +1,225 @@
+"""
+Serve mode, which serves the webpage over HTTP and only runs scripts
+when their figures are first requested.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+import attr
+
+from scrunner.failures import RetryPolicy
+from scrunner.html import create_webpage
+from scrunner.runner import ScriptRunner
+
+
+class ScriptRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Request handler that serves files from the output directory,
+    running the producing script first if a figure does not yet exist.
+    """
+
+    server_runner: "ScriptServer"
+
+    def __init__(self, *args, server_runner: "ScriptServer", **kwargs):
+        self.server_runner = server_runner
+
+        super().__init__(*args, directory=str(server_runner.output_directory), **kwargs)
+
+    def do_GET(self):
+        """
+        Serves the webpage, or a file from the output directory.
+        """
+
+        filename = Path(unquote(urlsplit(self.path).path).lstrip("/"))
+
+        if filename in (Path(""), Path("index.html")):
+            html = self.server_runner.render_webpage().encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(html)))
+            self.end_headers()
+            self.wfile.write(html)
+
+            return
+
+        self.server_runner.ensure_output(filename)
+
+        super().do_GET()
+
+    def log_message(self, format: str, *args):
+        """
+        Suppresses the per-request logging of the base handler.
+        """
+
+        return
+
+
+@attr.s(auto_attribs=False)
+class ScriptServer:
+    """
+    Serves the webpage for a set of scripts over HTTP, producing
+    figures on demand.
+
+    The webpage is available immediately, and lists all figures that
+    the scripts would produce. When a figure that does not yet exist in
+    the output directory is requested, the script that produces it is
+    queued to run (with at most ``max_workers`` scripts running at
+    once). Requests for other figures produced by the same script wait
+    for that single run rather than starting their own. The figures are
+    written to the output directory as usual, so later requests for
+    them are served directly from disk. Scripts that fail transiently
+    are retried according to ``retry``, which is shared by all runs so
+    that retries of scripts that ran out of memory are ran one at a
+    time.
+    """
+
+    runner = attr.ib(type=ScriptRunner)
+    data = attr.ib(type=list[Path], converter=lambda x: [Path(d) for d in x])
+    output_directory = attr.ib(type=Path, converter=Path)
+    file_type = attr.ib(type=str)
+    number_of_figures = attr.ib(type=int)
+    stylesheet = attr.ib(type=str)
+    interpreter = attr.ib(type=Optional[str], default=None)
+    host = attr.ib(type=str, default="127.0.0.1")
+    port = attr.ib(type=int, default=8000)
+    max_workers = attr.ib(type=int, default=1)
+    timeout = attr.ib(type=Optional[float], default=None)
+    retry = attr.ib(type=Optional[RetryPolicy], default=None)
+
+    output_scripts: dict[Path, Path]
+    script_runs: dict[Path, Future]
+    pool: ThreadPoolExecutor
+    lock: Lock
+
+    def __attrs_post_init__(self):
+        """
+        Sets up the mapping from outputs to scripts, and the pool that
+        the scripts will be ran in.
+        """
+
+        self.output_scripts = self.runner.get_output_scripts(
+            file_type=self.file_type, number_of_figures=self.number_of_figures
+        )
+        self.script_runs = {}
+        self.pool = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        self.lock = Lock()
+        self.retry = RetryPolicy() if self.retry is None else self.retry
+
+    def run_script(self, script_path: Path) -> Future:
+        """
+        Queues a script to run, unless it has already been queued.
+
+        Parameters
+        ----------
+
+        script_path: Path
+            The path of the script to run.
+
+        Returns
+        -------
+
+        run: Future
+            Future that completes when the script has been ran.
+        """
+
+        with self.lock:
+            if script_path not in self.script_runs:
+                self.script_runs[script_path] = self.pool.submit(
+                    self.runner.run,
+                    data=self.data,
+                    output_directory=self.output_directory,
+                    file_type=self.file_type,
+                    number_of_figures=self.number_of_figures,
+                    stylesheet=self.stylesheet,
+                    interpreter=self.interpreter,
+                    scripts=[script_path],
+                    timeout=self.timeout,
+                    retry=self.retry,
+                )
+
+            return self.script_runs[script_path]
+
+    def ensure_output(self, filename: Path):
+        """
+        Makes sure that an output has been produced, running its script
+        (and waiting for it to complete) if required. Outputs whose
+        script has already been ran are not re-produced, even if the
+        script failed to produce them.
+
+        Parameters
+        ----------
+
+        filename: Path
+            The output file path, relative to the output directory.
+        """
+
+        if (self.output_directory / filename).exists():
+            return
+
+        script_path = self.output_scripts.get(filename, None)
+
+        if script_path is None:
+            return
+
+        self.run_script(script_path).result()
+
+        return
+
+    def render_webpage(self) -> str:
+        """
+        Renders (and saves) the webpage, including all figures that the
+        scripts would produce.
+
+        Returns
+        -------
+
+        html: str
+            The rendered webpage.
+        """
+
+        with self.lock:
+            webpage = create_webpage(
+                runner=self.runner,
+                output_directory=self.output_directory,
+                file_type=self.file_type,
+                number_of_figures=self.number_of_figures,
+                only_existing=False,
+                lazy=True,
+            )
+
+        return webpage.html
+
+    def serve(self):
+        """
+        Serves the webpage until interrupted (e.g. with Ctrl-C). Scripts
+        that capture their standard output are queued to run
+        immediately, so that it can be shown on the page.
+        """
+
+        for script, script_path in zip(self.runner.scripts, self.runner.script_paths):
+            if script.capture_stdout:
+                self.run_script(script_path)
+
+        server = ThreadingHTTPServer(
+            (self.host, self.port),
+            partial(ScriptRequestHandler, server_runner=self),
+        )
+
+        print(f"Serving {self.output_directory} at http://{self.host}:{self.port}/")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+        return
@@ -0,0 +1,347 @@
+"""
+Content-addressed object store, used to de-duplicate outputs that are
+identical across many output directories.
+"""
+
+import argparse as ap
+import hashlib
+import os
+import shutil
+import stat
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+import attr
+
+from scrunner.runner import STATE_FILENAME
+
+# Files that are re-written on every run, and hence are never linked
+# into the store.
+UNSTORED_FILENAMES = {"index.html", STATE_FILENAME}
+
+
+def hash_file(path: Path) -> str:
+    """
+    Gets the SHA-256 hex digest of the contents of a file.
+    """
+
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+@attr.s(auto_attribs=False)
+class ObjectStore:
+    """
+    A shared store of outputs, keyed by the hash of their contents.
+
+    Outputs are moved into the store under ``objects/``, and linked
+    back into their output directory. Hard links are used where
+    possible, falling back to symbolic links when the store is on a
+    different filesystem (or if ``link`` is set to ``"symlink"``).
+    Objects are made read-only, so that they are not modified through
+    any of their links.
+
+    Output directories that have been de-duplicated are recorded in
+    ``runs.txt``, so that ``collect_garbage`` can find the objects
+    that they still reference.
+    """
+
+    path = attr.ib(type=Path, converter=Path)
+    link = attr.ib(
+        type=str,
+        default="hardlink",
+        validator=attr.validators.in_(["hardlink", "symlink"]),
+    )
+
+    @property
+    def objects_path(self) -> Path:
+        return self.path / "objects"
+
+    @property
+    def runs_path(self) -> Path:
+        return self.path / "runs.txt"
+
+    def object_path(self, digest: str) -> Path:
+        """
+        Gets the path of the object with a given digest.
+        """
+
+        return self.objects_path / digest[:2] / digest[2:]
+
+    def is_object(self, path: Path) -> bool:
+        """
+        Whether a path is a symbolic link to, or hard link of, an
+        object in the store.
+        """
+
+        try:
+            if path.is_symlink():
+                return self.objects_path.resolve() in path.resolve().parents
+
+            if path.stat().st_nlink == 1:
+                return False
+
+            digest = hash_file(path)
+            return os.path.samefile(path, self.object_path(digest))
+        except OSError:
+            return False
+
+    def get_runs(self) -> list[Path]:
+        """
+        Gets the output directories that have been de-duplicated into
+        the store.
+        """
+
+        if not self.runs_path.exists():
+            return []
+
+        with open(self.runs_path, "r") as handle:
+            return [Path(line.strip()) for line in handle if line.strip()]
+
+    def register(self, output_directory: Path):
+        """
+        Records an output directory as referencing the store.
+        """
+
+        output_directory = Path(output_directory).resolve()
+
+        if output_directory in self.get_runs():
+            return
+
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        with open(self.runs_path, "a") as handle:
+            handle.write(f"{output_directory}\n")
+
+        return
+
+    def replace_with_link(self, path: Path, target: Path, symbolic: bool):
+        """
+        Atomically replaces ``path`` with a (hard or symbolic) link to
+        ``target``.
+        """
+
+        temporary = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+
+        if symbolic:
+            os.symlink(target.resolve(), temporary)
+        else:
+            os.link(target, temporary)
+
+        os.replace(temporary, path)
+
+        return
+
+    def add(self, path: Path, digest: Optional[str] = None) -> Path:
+        """
+        Moves a file into the store, replacing it with a link to the
+        stored object. If an identical object already exists, the file
+        is linked to that instead.
+
+        Parameters
+        ----------
+
+        path: Path
+            The file to add.
+
+        digest: str, optional
+            The digest of the file, if it is already known.
+
+        Returns
+        -------
+
+        object_path: Path
+            The path to the object in the store.
+        """
+
+        digest = hash_file(path) if digest is None else digest
+        object_path = self.object_path(digest)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Already linked (e.g. an output of a script that was not re-ran);
+        # replacing a hard link with another link to the same file would
+        # do nothing, leaving the temporary link behind.
+        if object_path.exists() and os.path.samefile(path, object_path):
+            return object_path
+
+        if self.link == "hardlink":
+            try:
+                os.link(path, object_path)
+                os.chmod(object_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                return object_path
+            except FileExistsError:
+                try:
+                    self.replace_with_link(path, object_path, symbolic=False)
+                    return object_path
+                except OSError:
+                    pass
+            except OSError:
+                # Most likely, the store is on a different filesystem.
+                pass
+
+        if not object_path.exists():
+            temporary = object_path.with_name(f".{uuid4().hex}.tmp")
+            shutil.copyfile(path, temporary)
+            os.chmod(temporary, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+            try:
+                os.link(temporary, object_path)
+            except FileExistsError:
+                pass
+            finally:
+                temporary.unlink()
+
+        self.replace_with_link(path, object_path, symbolic=True)
+
+        return object_path
+
+    def deduplicate(self, output_directory: Path) -> int:
+        """
+        Moves all outputs in an output directory into the store.
+
+        Parameters
+        ----------
+
+        output_directory: Path
+            The output directory to de-duplicate.
+
+        Returns
+        -------
+
+        n_bytes: int
+            The number of bytes of outputs that are now shared with
+            objects that were already in the store.
+        """
+
+        self.register(output_directory)
+
+        n_bytes = 0
+
+        for path in sorted(Path(output_directory).rglob("*")):
+            if (
+                path.is_symlink()
+                or not path.is_file()
+                or path.name in UNSTORED_FILENAMES
+            ):
+                continue
+
+            digest = hash_file(path)
+            existed = self.object_path(digest).exists()
+            self.add(path, digest=digest)
+
+            if existed:
+                n_bytes += path.stat().st_size
+
+        return n_bytes
+
+    def detach(self, output_directory: Path):
+        """
+        Removes all links to the store from an output directory, so that
+        outputs that are not re-created by a run do not remain. Outputs
+        that are re-created are unlinked by ``ScriptRunner.run`` before
+        their script runs, so the shared objects are not modified even
+        if this is not called, and it is not needed when only some of
+        the scripts are re-ran.
+
+        Parameters
+        ----------
+
+        output_directory: Path
+            The output directory to detach from the store.
+        """
+
+        for path in sorted(Path(output_directory).rglob("*")):
+            if path.name in UNSTORED_FILENAMES or not self.is_object(path):
+                continue
+
+            path.unlink()
+
+        return
+
+    def collect_garbage(self, dry_run: bool = False) -> list[Path]:
+        """
+        Removes objects that are no longer referenced by any output
+        directory. Hard-linked objects are referenced if they have any
+        other links; symbolically linked objects are referenced if a
+        registered output directory contains a link to them. Output
+        directories that no longer exist are removed from the registry.
+
+        Parameters
+        ----------
+
+        dry_run: bool
+            If ``True``, only report the objects that would be removed.
+
+        Returns
+        -------
+
+        removed: list[Path]
+            The objects that were (or would be) removed.
+        """
+
+        runs = [run for run in self.get_runs() if run.is_dir()]
+        referenced = set()
+
+        for run in runs:
+            for path in run.rglob("*"):
+                if path.is_symlink():
+                    referenced.add(path.resolve())
+
+        removed = []
+
+        for object_path in sorted(self.objects_path.glob("*/*")):
+            if object_path.name.endswith(".tmp"):
+                continue
+
+            if object_path.stat().st_nlink > 1 or object_path.resolve() in referenced:
+                continue
+
+            removed.append(object_path)
+
+            if not dry_run:
+                object_path.unlink()
+
+        if not dry_run and self.runs_path.exists():
+            with open(self.runs_path, "w") as handle:
+                handle.writelines(f"{run}\n" for run in runs)
+
+        return removed
+
+
+if __name__ == "__main__":
+    parser = ap.ArgumentParser(
+        description=(
+            "Garbage collection for a ScRunner object store. Removes all "
+            + "objects that are no longer referenced by any output directory."
+        )
+    )
+
+    parser.add_argument("command", choices=["gc"])
+
+    parser.add_argument(
+        "store",
+        help="Path to the object store.",
+        type=Path,
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        help="Only list the objects that would be removed.",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    removed = ObjectStore(path=args.store).collect_garbage(dry_run=args.dry_run)
+
+    print("\n".join(str(path) for path in removed))
+    print(
+        f"{'Would remove' if args.dry_run else 'Removed'} {len(removed)} "
+        + "unreferenced objects"
+    )
@@ -0,0 +1,25 @@
+{% raw %}
+
+/* Loads the figure in a lightbox only when the lightbox is opened, so
+   that figures are not requested (and hence, in serve mode, produced)
+   until they are looked at. */
+
+(function () {
+    function loadLightbox() {
+        var target = document.getElementById(window.location.hash.slice(1));
+
+        if (target === null) {
+            return;
+        }
+
+        target.querySelectorAll("img[data-src]").forEach(function (image) {
+            image.src = image.dataset.src;
+            image.removeAttribute("data-src");
+        });
+    }
+
+    window.addEventListener("hashchange", loadLightbox);
+    loadLightbox();
+})();
+
+{% endraw %}
@@ -0,0 +1,55 @@
+{% raw %}
+
+/* Loads figures from a packed output archive with HTTP range requests. */
+
+(function () {
+    var pack = JSON.parse(document.getElementById("pack-index").textContent);
+    var archive = null;
+    var figures = {};
+
+    function getRange(offset, size) {
+        /* Falls back to fetching the whole archive once if the server
+           does not support range requests. */
+        if (archive !== null) {
+            return archive.then(function (buffer) {
+                return buffer.slice(offset, offset + size);
+            });
+        }
+
+        return fetch(pack.filename, {
+            headers: { Range: "bytes=" + offset + "-" + (offset + size - 1) }
+        }).then(function (response) {
+            if (response.status === 206) {
+                return response.arrayBuffer();
+            }
+
+            archive = response.arrayBuffer();
+
+            return getRange(offset, size);
+        });
+    }
+
+    function getFigure(filename) {
+        if (!(filename in figures)) {
+            var location = pack.index[filename];
+
+            figures[filename] = getRange(location[0], location[1]).then(
+                function (buffer) {
+                    return URL.createObjectURL(
+                        new Blob([buffer], { type: location[2] })
+                    );
+                }
+            );
+        }
+
+        return figures[filename];
+    }
+
+    document.querySelectorAll("img[data-packed]").forEach(function (image) {
+        getFigure(image.dataset.packed).then(function (url) {
+            image.src = url;
+        });
+    });
+})();
+
+{% endraw %}
@@ -0,0 +1,307 @@
+"""
+Watch mode, which re-runs scripts when they (or the data that they
+depend on) change.
+"""
+
+import ast
+import os
+from pathlib import Path
+from threading import Event, Thread
+from time import perf_counter, sleep
+from typing import Optional
+
+import attr
+
+from scrunner.failures import RetryPolicy
+from scrunner.html import create_webpage
+from scrunner.runner import ScriptRunner
+
+
+@attr.s(auto_attribs=False)
+class ScriptWatcher:
+    """
+    Watches a script directory, and the data files, for changes and
+    re-runs only the affected scripts.
+
+    Files are watched by polling their modification times and sizes,
+    every ``poll_interval`` seconds. Changes are collected until no
+    further changes have been seen for ``debounce`` seconds, at which
+    point the affected scripts are re-run and the webpage is
+    regenerated. If a run is still in progress when a newer change
+    arrives, it is cancelled and its scripts are re-run along with the
+    newly affected ones.
+
+    A script is affected by a change to:
+    + The script itself.
+    + Any non-script python file in the script directory that it
+      (transitively) imports.
+    + Any of the data files, or the stylesheet if it is a file.
+    """
+
+    runner = attr.ib(type=ScriptRunner)
+    data = attr.ib(type=list[Path], converter=lambda x: [Path(d) for d in x])
+    output_directory = attr.ib(type=Path, converter=Path)
+    file_type = attr.ib(type=str)
+    number_of_figures = attr.ib(type=int)
+    stylesheet = attr.ib(type=str)
+    interpreter = attr.ib(type=Optional[str], default=None)
+    poll_interval = attr.ib(type=float, default=0.5)
+    debounce = attr.ib(type=float, default=1.0)
+    timeout = attr.ib(type=Optional[float], default=None)
+    retry = attr.ib(type=Optional[RetryPolicy], default=None)
+
+    snapshot: dict[Path, tuple[int, int]]
+    run_thread: Optional[Thread]
+    run_cancel: Event
+    running_scripts: set[Path]
+
+    def __attrs_post_init__(self):
+        """
+        Takes the initial snapshot of the watched files.
+        """
+
+        self.snapshot = self.take_snapshot()
+        self.run_thread = None
+        self.run_cancel = Event()
+        self.running_scripts = set()
+
+    @property
+    def shared_dependencies(self) -> set[Path]:
+        """
+        Files that all scripts depend on.
+        """
+
+        shared = set(self.data)
+
+        if Path(self.stylesheet).is_file():
+            shared.add(Path(self.stylesheet))
+
+        return shared
+
+    def take_snapshot(self) -> dict[Path, tuple[int, int]]:
+        """
+        Gets the modification time and size of all watched files.
+
+        Returns
+        -------
+
+        snapshot: dict[Path, tuple[int, int]]
+            Modification time (in ns) and size for each watched file
+            that currently exists.
+        """
+
+        snapshot = {}
+
+        for path in [*self.runner.path.glob("*.py"), *self.shared_dependencies]:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    @staticmethod
+    def imported_modules(path: Path) -> set[str]:
+        """
+        Gets the names of the top-level modules imported by a python
+        file. Files that cannot be parsed (for instance, because they
+        are in the middle of being edited) are assumed to import nothing.
+        """
+
+        try:
+            with open(path, "r") as handle:
+                tree = ast.parse(handle.read(), filename=str(path))
+        except (OSError, SyntaxError, ValueError):
+            return set()
+
+        modules = set()
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.module is not None:
+                    modules.add(node.module.split(".")[0])
+
+                if node.level > 0:
+                    modules.update(alias.name for alias in node.names)
+
+        return modules
+
+    def get_dependencies(self) -> dict[Path, set[Path]]:
+        """
+        Gets the set of files that each script depends on.
+
+        Returns
+        -------
+
+        dependencies: dict[Path, set[Path]]
+            The files that each script (keyed by its path) depends on,
+            including the script itself.
+        """
+
+        python_files = {path.stem: path for path in self.runner.path.glob("*.py")}
+
+        imports = {
+            path: {
+                python_files[name]
+                for name in self.imported_modules(path)
+                if name in python_files
+            }
+            for path in python_files.values()
+        }
+
+        shared = self.shared_dependencies
+        dependencies = {}
+
+        for script_path in self.runner.script_paths:
+            seen = set()
+            stack = [script_path]
+
+            while stack:
+                path = stack.pop()
+
+                if path in seen:
+                    continue
+
+                seen.add(path)
+                stack.extend(imports.get(path, set()))
+
+            dependencies[script_path] = seen | shared
+
+        return dependencies
+
+    def affected_scripts(self, changed: set[Path]) -> set[Path]:
+        """
+        Gets the paths of the scripts affected by a set of changed files.
+        """
+
+        return {
+            script_path
+            for script_path, dependencies in self.get_dependencies().items()
+            if not dependencies.isdisjoint(changed)
+        }
+
+    def cancel_run(self) -> set[Path]:
+        """
+        Cancels the in-progress run, if any, and waits for it to stop.
+
+        Returns
+        -------
+
+        scripts: set[Path]
+            The scripts that were part of the cancelled run.
+        """
+
+        if self.run_thread is None or not self.run_thread.is_alive():
+            return set()
+
+        self.run_cancel.set()
+        self.run_thread.join()
+
+        return self.running_scripts
+
+    def start_run(self, scripts: set[Path]):
+        """
+        Starts running the given scripts in the background, regenerating
+        the webpage if the run is not cancelled.
+        """
+
+        self.run_cancel = Event()
+        self.running_scripts = scripts
+
+        def run_and_create_webpage(cancel: Event):
+            completed = self.runner.run(
+                data=self.data,
+                output_directory=self.output_directory,
+                file_type=self.file_type,
+                number_of_figures=self.number_of_figures,
+                stylesheet=self.stylesheet,
+                interpreter=self.interpreter,
+                scripts=list(scripts),
+                cancel=cancel,
+                timeout=self.timeout,
+                retry=self.retry,
+            )
+
+            if completed:
+                create_webpage(
+                    runner=self.runner,
+                    output_directory=self.output_directory,
+                    file_type=self.file_type,
+                    number_of_figures=self.number_of_figures,
+                )
+                print(f"Updated {self.output_directory / 'index.html'}")
+
+        self.run_thread = Thread(
+            target=run_and_create_webpage, args=(self.run_cancel,), daemon=True
+        )
+        self.run_thread.start()
+
+    def rerun(self, changed: set[Path]):
+        """
+        Re-runs the scripts affected by a set of changed files, cancelling
+        any stale run that is still in progress.
+        """
+
+        scripts = self.cancel_run()
+
+        if any(path.parent == self.runner.path for path in changed):
+            try:
+                self.runner.scripts, self.runner.script_paths = (
+                    self.runner.parse_scripts()
+                )
+            except RuntimeError as e:
+                print(f"Not re-running scripts: {e}")
+                return
+
+        scripts = (scripts | self.affected_scripts(changed)) & set(
+            self.runner.script_paths
+        )
+
+        if len(scripts) == 0:
+            return
+
+        print(
+            "Re-running "
+            + ", ".join(sorted(str(path.name) for path in scripts))
+            + " after changes to "
+            + ", ".join(sorted(str(path) for path in changed))
+        )
+
+        self.start_run(scripts=scripts)
+
+    def watch(self):
+        """
+        Watches for changes until interrupted (e.g. with Ctrl-C).
+        """
+
+        print(f"Watching {self.runner.path} and data files for changes...")
+
+        pending = set()
+        last_change = perf_counter()
+
+        try:
+            while True:
+                sleep(self.poll_interval)
+
+                snapshot = self.take_snapshot()
+                changed = {
+                    path
+                    for path in self.snapshot.keys() | snapshot.keys()
+                    if self.snapshot.get(path) != snapshot.get(path)
+                }
+                self.snapshot = snapshot
+
+                if changed:
+                    pending |= changed
+                    last_change = perf_counter()
+                elif pending and perf_counter() - last_change >= self.debounce:
+                    self.rerun(changed=pending)
+                    pending = set()
+        except KeyboardInterrupt:
+            self.cancel_run()
+
+        return